@@ -1,53 +1,40 @@
 import subprocess
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from code.gis_utils import query_data, get_nearest_restaurants
-from code.match_sql import RestaurantMatcher  
-import folium
-from shapely.geometry import Point
-from streamlit_folium import st_folium
+from code.filters import Filters
 import os
-from sqlalchemy import text
-from code.database import get_engine
+from code.database import get_engine, pool_stats
+from code.country_statistics import CountryStatistics
+from code.model_registry import MODEL_NAME, warm_up_in_background
+from code.repository import FilteredRestaurant, RestaurantRepository
+# The matcher (sentence-transformers, torch) and the interactive map (geopandas, shapely, folium, scikit-learn)
+# are imported where they are first used, so the page starts rendering before those heavy imports.
 
 engine = get_engine()
-# Helper function to run SQL queries
+
+
+@st.cache_resource
+def start_model_warm_up():
+    """Load and warm the query encoder in a background thread, once per server process, while the page renders."""
+    return warm_up_in_background(MODEL_NAME)
+
+
+start_model_warm_up()
+
+@st.cache_resource
+def get_country_statistics():
+    """One cached copy of the country statistics per server process, reloaded after each ingest."""
+    return CountryStatistics(engine)
+
+
 def create_map():
     """
-    Query statistical data from the database and save it as a CSV file.
-    """
-
-    query = """
-    SELECT 
-        c.iso_code,
-        c.country,
-        COUNT(*) AS total_michelin,
-        SUM(CASE WHEN CAST(c.stars_label AS INTEGER) = 0 THEN 1 ELSE 0 END) AS zero_star,
-        SUM(CASE WHEN CAST(c.stars_label AS INTEGER) = 1 THEN 1 ELSE 0 END) AS one_star,
-        SUM(CASE WHEN CAST(c.stars_label AS INTEGER) = 2 THEN 1 ELSE 0 END) AS two_star,
-        SUM(CASE WHEN CAST(c.stars_label AS INTEGER) = 3 THEN 1 ELSE 0 END) AS three_star
-    FROM 
-        cleaned_data_with_embeddings c
-    GROUP BY 
-        c.iso_code, c.country
-    ORDER BY 
-        total_michelin DESC;
+    Return the Michelin statistics by country, from the country_statistics materialized view.
     """
-    
-    engine = get_engine()
     try:
-        with engine.connect() as connection:
-            # Fetch the data from the database
-            data = pd.read_sql(query, connection)
-            print(data.head())  # Print the first few rows to confirm data is being fetched
-
-        # Save the data to a CSV file
-        output_file = "michelin_statistics_by_country.csv"
-        data.to_csv(output_file, index=False)
-        print(f"Data saved to {output_file}")
-        return data
-
+        return get_country_statistics().load()
     except Exception as e:
         print(f"Error occurred: {e}")
         return None
@@ -70,27 +57,6 @@ except Exception as e:
     st.error(f"Error occurred while fetching Michelin data: {e}")
     st.stop()
 
-csv_file = "michelin_statistics_by_country.csv"
-if not os.path.exists(csv_file):
-    st.error(f"Error: {csv_file} not found after data fetching. Ensure database is accessible.")
-    st.stop()
-
-data = pd.read_csv(csv_file)
-
-print("Unique country names in dataset:", data["country"].unique())
-
-# Prepare data for the world map
-hover_texts = []
-for _, row in data.iterrows():
-    hover_text = f"<b>{row['country']}</b><br>Total Restaurants: {row['total_michelin']}<br>"
-    hover_text += f"0 Stars: {row['zero_star']}<br>"
-    hover_text += f"1 Star: {row['one_star']}<br>"
-    hover_text += f"2 Stars: {row['two_star']}<br>"
-    hover_text += f"3 Stars: {row['three_star']}<br>"
-    hover_texts.append(hover_text)
-
-data["hover_text"] = hover_texts
-
 # Create the choropleth map
 fig = px.choropleth(
     data,
@@ -131,25 +97,23 @@ fig.update_traces(
 # Display the full-screen world map
 st.plotly_chart(fig, use_container_width=True)
 
-def run_query(query, params=None):
-    engine = get_engine()
-    with engine.connect() as conn:
-        return pd.read_sql_query(text(query), conn, params=params)
+@st.cache_resource
+def get_repository():
+    """The read queries of the app, sharing the process-wide connection pool."""
+    return RestaurantRepository(engine)
+
 
+repository = get_repository()
 
 st.write("### Filter Michelin Restaurants")
 
 # Fetch unique options for filters from the database
 @st.cache_data
 def get_filter_options():
-    query = """
-    SELECT DISTINCT stars_label, country, food_type
-    FROM cleaned_data_with_embeddings
-    """
-    data = run_query(query)
-    star_options = ["All"] + sorted(data["stars_label"].astype(str).unique())
-    country_options = ["All"] + sorted(data["country"].dropna().unique())
-    cuisine_options = ["All"] + sorted(data["food_type"].dropna().unique())
+    options = repository.filter_options()
+    star_options = ["All"] + [str(stars) for stars in options.stars]
+    country_options = ["All"] + options.countries
+    cuisine_options = ["All"] + options.cuisines
     return star_options, country_options, cuisine_options
 
 
@@ -161,37 +125,27 @@ selected_country = st.selectbox("Select Country:", country_options)
 selected_cuisine = st.selectbox("Select Cuisine Type:", cuisine_options)
 selected_price = st.slider("Select Price Range (0 = Cheapest, 4 = Most Expensive):", 0, 4, (0, 4))
 
-# Build SQL query based on filters
-query = """
-SELECT name AS "Restaurant Name", 
-       food_type AS "Cuisine", 
-       country AS "Country", 
-       stars_label AS "Star Rating",
-       CAST(price_symbol_count AS INTEGER) AS "Price Range",
-       description
-FROM cleaned_data_with_embeddings
-WHERE 1=1
-"""
-params = {}
-
-if selected_star != "All":
-    query += " AND stars_label = :stars_label"
-    params["stars_label"] = selected_star
-if selected_country != "All":
-    query += " AND country = :country"
-    params["country"] = selected_country
-if selected_cuisine != "All":
-    query += " AND food_type = :food_type"
-    params["food_type"] = selected_cuisine
-query += " AND CAST(price_symbol_count AS INTEGER) BETWEEN :min_price AND :max_price"
-params["min_price"], params["max_price"] = selected_price
+
+def selected_filters():
+    """The filter widgets as search filters; "All" and the full price range do not filter."""
+    stars = None
+    if selected_star != "All" and selected_star.replace(".", "", 1).isdigit():
+        stars = [int(float(selected_star))]
+    return Filters(
+        stars=stars,
+        countries=[selected_country] if selected_country != "All" else None,
+        food_types=[selected_cuisine] if selected_cuisine != "All" else None,
+        price_range=selected_price if selected_price != (0, 4) else None,
+    )
+
 
 # Run the filtered query
-filtered_data = run_query(query, params=params)
+filtered_data = pd.DataFrame(repository.filter_restaurants(selected_filters()), columns=FilteredRestaurant._fields)
 
 # Prepare data for display
-filtered_data = filtered_data[["Restaurant Name", "Cuisine", "Country", "Star Rating", "Price Range"]]
-filtered_data.reset_index(drop=True, inplace=True)
+filtered_data = filtered_data[["name", "cuisine", "country", "stars", "price"]].rename(columns={
+    "name": "Restaurant Name", "cuisine": "Cuisine", "country": "Country", "stars": "Star Rating", "price": "Price Range",
+})
 filtered_data.index += 1  
 filtered_data.index.name = "No."
 
@@ -204,13 +158,24 @@ else:
 
 # AI-Powered Restaurant Search
 st.write("### Combined AI and Keyword Search")
-matcher = RestaurantMatcher()
+
+@st.cache_resource
+def get_matcher():
+    """One matcher per server process: the model and the query caches survive reruns and are shared by sessions."""
+    from code.match_sql import RestaurantMatcher
+
+    return RestaurantMatcher()
+
+
+matcher = get_matcher()
 ai_query = st.text_input("Enter a query to find restaurants (e.g., 'cozy Italian bistro with pasta'):")
+use_filters = st.checkbox("Apply the filters above to the AI search", value=True)
+
 
 if ai_query:
     try:
         st.write("Running AI-based search...")
-        ai_results = matcher.match(ai_query) 
+        ai_results = matcher.match(ai_query, hybrid=True, filters=selected_filters() if use_filters else None)
         ai_results_df = pd.DataFrame(ai_results)
         ai_results_df = ai_results_df[
             ["name", "address", "country", "stars_label", "iso_code", "similarity"]
@@ -228,34 +193,95 @@ if ai_query:
         )
         st.write("### AI Search Results")
         st.dataframe(ai_results_df, use_container_width=True)
+        stats = matcher.cache_stats()
+        st.caption(f"Query cache: {stats['results']['hits']} hits, {stats['results']['misses']} misses")
     except Exception as e:
         st.error(f"An error occurred: {e}")
 
 
 
 
+MAP_KEY = "restaurant_map"
+MAP_WIDTH, MAP_HEIGHT = 800, 600
+
+
+@st.cache_resource
+def load_restaurant_points():
+    """
+    The restaurant locations with their popup text, spatial index and map clusters, loaded once per server
+    process and never modified.
+    """
+    from code.gis_utils import query_data
+    from code.spatial_index import ClusterGrid, SpatialIndex
+
+    gdf = query_data(repository)
+    gdf["popup"] = (
+        gdf["name"] + " (" + gdf["stars_label"].astype(str) + " stars)<br>"
+        + gdf["food_type"].fillna("") + "<br>" + gdf["address"].fillna("")
+    )
+    return gdf, SpatialIndex(gdf), ClusterGrid(gdf)
+
+
+def visible_markers(gdf, clusters, view):
+    """A feature group with the clusters, or single restaurants, inside the map's last reported bounds and zoom."""
+    import folium
+    from code.spatial_index import viewport
+
+    bounds = view.get("bounds") or {}
+    south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    if south_west.get("lat") is None or north_east.get("lat") is None:
+        south, west, north, east = viewport(view["center"]["lat"], view["center"]["lng"], view["zoom"], MAP_WIDTH, MAP_HEIGHT)
+    else:
+        south, west, north, east = south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"]
+
+    group = folium.FeatureGroup(name="Restaurants")
+    markers = clusters.markers(south, west, north, east, view["zoom"])
+    popups = gdf["popup"].to_numpy()
+    for latitude, longitude, count, row in markers.itertuples(index=False):
+        if count == 1:
+            folium.Marker(location=[latitude, longitude], popup=popups[row]).add_to(group)
+        else:
+            folium.CircleMarker(
+                location=[latitude, longitude], radius=8 + 4 * np.log10(count), tooltip=f"{count} restaurants",
+                color="#c0392b", fill=True, fill_opacity=0.6,
+            ).add_to(group)
+    return group
+
+
 def interactive_map():
+    import folium
+    from shapely.geometry import Point
+    from streamlit_folium import st_folium
+    from code.gis_utils import get_nearest_restaurants
+
     st.write("### Interactive Map with Nearest Restaurants")
 
-    gdf = query_data()
+    gdf, spatial_index, clusters = load_restaurant_points()
 
+    # The map is drawn once; on pan and zoom only the markers of the new viewport are sent to it.
     map_center = [gdf.geometry.y.mean(), gdf.geometry.x.mean()]
     m = folium.Map(location=map_center, zoom_start=12)
-
-    for _, row in gdf.iterrows():
-        folium.Marker(
-            location=[row.geometry.y, row.geometry.x],
-            popup=f"{row['name']} ({row['stars_label']} stars)<br>{row['food_type']}<br>{row['address']}",
-        ).add_to(m)
-
-    map_data = st_folium(m, width=800, height=600)
+    view = st.session_state.get(MAP_KEY) or {}
+    view = {
+        "center": view.get("center") or {"lat": map_center[0], "lng": map_center[1]},
+        "zoom": view.get("zoom") or 12,
+        "bounds": view.get("bounds"),
+    }
+    map_data = st_folium(
+        m, key=MAP_KEY, width=MAP_WIDTH, height=MAP_HEIGHT,
+        returned_objects=["last_clicked", "bounds", "zoom", "center"],
+        feature_group_to_add=visible_markers(gdf, clusters, view),
+    )
 
     if map_data["last_clicked"] is not None:
         clicked_point = Point(map_data["last_clicked"]["lng"], map_data["last_clicked"]["lat"])
-        nearest_restaurants = get_nearest_restaurants(clicked_point, gdf)
+        nearest_restaurants = get_nearest_restaurants(clicked_point, gdf, index=spatial_index)
 
         st.write("### Nearest Restaurants")
         st.table(
-            nearest_restaurants[['stars_label', 'name', 'food_type', 'address']].sort_values(by='stars_label', ascending=False)
+            nearest_restaurants[['stars_label', 'name', 'food_type', 'address', 'distance_km']].sort_values(by='stars_label', ascending=False)
         )
 interactive_map()
+
+with st.sidebar.expander("Database connections"):
+    st.json(pool_stats())
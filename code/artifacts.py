@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+current_path = Path(__file__).resolve().parent
+project_root = current_path.parent
+artifacts_dir = project_root / "artifacts"
+
+PARQUET_NAME = "cleaned_data_with_embeddings.parquet"
+MATRIX_NAME = "embeddings.npy"
+IDS_NAME = "embedding_ids.npy"
+
+# Column names of the cleaned data and of the cleaned_data_with_embeddings table in sql/create_table.sql
+DB_COLUMNS = {
+    "UniqueID": "uniqueid",
+    "food type": "food_type",
+    "ISO Code": "iso_code",
+}
+
+
+def save_embedding_artifacts(df, ids, embeddings, folder=artifacts_dir):
+    """
+    Write the cleaned data with its embeddings as Parquet, plus a raw float32 matrix (`embeddings.npy`)
+    whose rows line up with `embedding_ids.npy`. Rows without a description have a null embedding in the
+    Parquet file and are left out of the matrix.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    ids = np.asarray(ids, dtype=np.int64)
+
+    dim = embeddings.shape[1]
+    row_of_id = pd.Series(np.arange(len(ids)), index=ids)
+    positions = row_of_id.reindex(df["UniqueID"].to_numpy()).to_numpy()
+    has_embedding = ~np.isnan(positions)
+    flat = np.zeros((len(df), dim), dtype=np.float32)
+    flat[has_embedding] = embeddings[positions[has_embedding].astype(np.int64)]
+    values = pa.array(flat.ravel(), type=pa.float32())
+    validity = pa.array(has_embedding).buffers()[1]
+    column = pa.Array.from_buffers(pa.list_(pa.float32(), dim), len(df), [validity], children=[values])
+
+    table = pa.Table.from_pandas(text_columns(df.drop(columns=["embedding"], errors="ignore")), preserve_index=False)
+    table = table.append_column("embedding", column)
+    pq.write_table(table, folder / PARQUET_NAME)
+    np.save(folder / MATRIX_NAME, embeddings)
+    np.save(folder / IDS_NAME, ids)
+
+
+def text_columns(df):
+    """Lists are stored as their text, as they are in the CSV files."""
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        df[column] = values.where(values.isna() | values.map(lambda value: isinstance(value, str)), values.astype(str))
+    return df
+
+
+def load_embedding_matrix(folder=artifacts_dir, mmap=True):
+    """Return (ids, matrix); by default the matrix is memory-mapped rather than read into memory."""
+    folder = Path(folder)
+    ids = np.load(folder / IDS_NAME)
+    matrix = np.load(folder / MATRIX_NAME, mmap_mode="r" if mmap else None)
+    return ids, matrix
+
+
+def load_restaurants(folder=artifacts_dir, columns=None):
+    """Return the cleaned restaurants from the Parquet artifact, without the embedding column unless asked for."""
+    import pyarrow.parquet as pq
+
+    if columns is None:
+        columns = [name for name in pq.read_schema(Path(folder) / PARQUET_NAME).names if name != "embedding"]
+    return pd.read_parquet(Path(folder) / PARQUET_NAME, columns=columns)
+
+
+def to_pgvector(matrix):
+    """Format each row of a matrix as pgvector text, e.g. '[0.1,0.2,...]'."""
+    return ["[" + ",".join(map(repr, row)) + "]" for row in np.asarray(matrix, dtype=np.float32).tolist()]
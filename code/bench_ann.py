@@ -0,0 +1,86 @@
+import argparse
+import time
+
+import numpy as np
+
+from artifacts import artifacts_dir, load_embedding_matrix
+from vector_index import HNSWIndex, IVFIndex, VectorIndex, hnswlib
+
+# Recall-vs-latency benchmark of the approximate indexes against exact search.
+# Usage: python3 code/bench_ann.py [--rows 100000] [--queries 500] [--artifacts]
+# --artifacts searches the real embeddings (queries are perturbed copies of random rows);
+# otherwise the rows are synthetic clustered 384-dimensional vectors.
+
+
+def synthetic(rows, dim=384, clusters=500, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, rows)] + 0.8 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+
+def queries_from(matrix, count, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = matrix[rng.integers(0, len(matrix), count)]
+    return (rows + 0.5 * rows.std() * rng.normal(size=rows.shape)).astype(np.float32)
+
+
+def run(label, index, queries, truth, k, **knobs):
+    """Search one query at a time, as match() does, and print latency percentiles and recall@k."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        positions, _ = index.search(query, k, **knobs)
+        latencies.append(time.perf_counter() - start)
+        hits += len(np.intersect1d(index.ids[positions], expected))
+    latencies = np.array(latencies) * 1000
+    print(f"{label:<22}{np.median(latencies):>9.3f} ms{np.percentile(latencies, 99):>9.3f} ms{hits / (k * len(queries)):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--artifacts", action="store_true")
+    args = parser.parse_args()
+
+    if args.artifacts:
+        ids, matrix = load_embedding_matrix(artifacts_dir, mmap=False)
+    else:
+        matrix = synthetic(args.rows)
+        ids = np.arange(len(matrix))
+    queries = queries_from(matrix, args.queries)
+    print(f"{len(matrix):,} rows, {args.queries} queries, recall@{args.k}")
+
+    exact = VectorIndex(ids, matrix)
+    truth = [exact.ids[positions] for positions, _ in exact.search_batch(queries, args.k)]
+    print(f"{'':<22}{'p50':>12}{'p99':>12}{'recall':>10}")
+    run("exact", exact, queries, truth, args.k)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(ids, matrix)
+    print(f"ivf build ({ivf.nlist} lists) {time.perf_counter() - start:.2f} s")
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        run(f"ivf nprobe={nprobe}", ivf, queries, truth, args.k, nprobe=nprobe)
+
+    if hnswlib is None:
+        print("hnswlib is not installed, skipping hnsw")
+        return
+    start = time.perf_counter()
+    hnsw = HNSWIndex.build(ids, matrix)
+    print(f"hnsw build (M={hnsw.m}, ef_construction={hnsw.ef_construction}) {time.perf_counter() - start:.2f} s")
+    for ef in (20, 32, 64, 128, 256):
+        hnsw.set_ef(ef)
+        run(f"hnsw ef={ef}", hnsw, queries, truth, args.k)
+
+    # Incremental inserts, as RestaurantMatcher.update_embeddings does after adding restaurants.
+    extra = synthetic(len(matrix) // 100, matrix.shape[1], seed=2)
+    extra_ids = np.arange(len(extra)) + ids.max() + 1
+    for index in (ivf, hnsw):
+        start = time.perf_counter()
+        index.add(extra_ids, extra)
+        print(f"{index.kind} insert of {len(extra):,} rows {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
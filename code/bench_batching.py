@@ -0,0 +1,71 @@
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from bench_encoder import QUERIES
+from model_registry import ENCODER_BACKENDS, MODEL_NAME, MicroBatcher, get_model, query_backend
+
+# Throughput and latency of the query encoder under concurrent load, with and without micro-batching.
+# Usage: python3 code/bench_batching.py [--clients 1 4 16] [--requests 50] [--config 8:2 --config 32:2] [--backend onnx]
+# Each client thread sends its queries one after another, as a Streamlit session does. "direct" is every
+# client calling model.encode([query]) itself; "batch N, M ms" goes through a MicroBatcher collecting up to
+# N queries for at most M ms. Every query is distinct, so no cache or deduplication helps.
+
+
+def client_texts(client, count):
+    return [f"{QUERIES[(client + number) % len(QUERIES)]} {client}-{number}" for number in range(count)]
+
+
+def load(encode, clients, requests):
+    """Run `clients` threads sending `requests` queries each through `encode`; return q/s and latencies in ms."""
+    latencies = [[] for _ in range(clients)]
+    start_line = threading.Barrier(clients + 1)
+
+    def client(number):
+        texts = client_texts(number, requests)
+        start_line.wait()
+        for text in texts:
+            start = time.perf_counter()
+            encode(text)
+            latencies[number].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return clients * requests / elapsed, np.concatenate(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="queries per client")
+    parser.add_argument("--config", action="append", default=[], help="batch size and wait, e.g. 32:2 (default 8:2, 32:2, 32:5)")
+    parser.add_argument("--backend", choices=ENCODER_BACKENDS, default=None)
+    args = parser.parse_args()
+
+    model = get_model(MODEL_NAME, args.backend or query_backend())
+    model.encode(["warm up"])
+    configs = [tuple(float(part) for part in config.split(":")) for config in args.config or ["8:2", "32:2", "32:5"]]
+
+    print(f"{'clients':<9}{'mode':<18}{'throughput':>14}{'p50':>11}{'p99':>11}{'mean batch':>12}")
+    for clients in args.clients:
+        throughput, latencies = load(lambda text: model.encode([text]), clients, args.requests)
+        print(f"{clients:<9}{'direct':<18}{throughput:>10.0f} q/s{np.median(latencies):>8.2f} ms"
+              f"{np.percentile(latencies, 99):>8.2f} ms{1:>12.1f}")
+        for size, wait in configs:
+            batcher = MicroBatcher(model, int(size), wait)
+            throughput, latencies = load(lambda text: batcher.submit(text).result(), clients, args.requests)
+            batcher.close()
+            print(f"{'':<9}{f'batch {size:.0f}, {wait:g} ms':<18}{throughput:>10.0f} q/s{np.median(latencies):>8.2f} ms"
+                  f"{np.percentile(latencies, 99):>8.2f} ms{batcher.stats()['mean_batch']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
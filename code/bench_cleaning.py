@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import tempfile
+import time
+
+import pandas as pd
+
+from data_cleaning import clean, clean_frame, iso_country_codes_path, load_jsonl_data, unmapped_countries
+
+# Benchmark of the cleaning stage on a synthetic raw_results.json.
+# Usage: python3 code/bench_cleaning.py [--rows 1000000] [--legacy] [--chunksize 100000 --workers 4]
+# --legacy also times the original row-by-row implementation on the same file;
+# --chunksize also times the streaming mode and reports peak RSS of the process.
+
+STARS = ["Three Stars: Exceptional cuisine", "Two Stars: Excellent cooking", "One Star: High quality cooking", "Bib Gourmand: good quality, good value cooking", "Selected Restaurants"]
+PLACES = ["75001 Paris, France", "Minato-ku, Tokyo, 106-0032, Japan", "New York, 10012, USA", "London, SW1X 7RJ, United Kingdom", "Istanbul, 34000, TÃ¼rkiye", "Hong Kong, Hong Kong SAR China"]
+FOOD_TYPES = ["French", "Japanese", "Italian", "Vegetarian", "Seafood", "Modern Cuisine", "Creative"]
+
+
+def write_synthetic(path, rows, seed=0):
+    """Writes `rows` raw restaurants shaped like the scraper output."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as file:
+        for num in range(rows):
+            res = {
+                "name": f"Restaurant {num} & Co.",
+                "address": f"{num} Rue d'Exemple, {rng.choice(PLACES)}",
+                "price": "$" * rng.randint(1, 4),
+                "stars": rng.choice(STARS),
+                "description": "Seasonal dishes, a cozy room & great wine list - open since 1999.",
+                "facilities_services": ["Air conditioning", "Terrace"],
+                "latitude and longitude": {"lat": rng.uniform(-90, 90), "lng": rng.uniform(-180, 180)} if rng.random() < 0.95 else "N/A",
+                "food type": rng.choice(FOOD_TYPES),
+            }
+            json.dump(res, file)
+            file.write("\n")
+
+
+def legacy_clean(input_path, output_path, iso_path):
+    """The original data_cleaning.py: row-wise .apply for every column and two CSV writes."""
+    data = []
+    with open(input_path, "r", encoding="utf-8") as file:
+        for line in file:
+            data.append(json.loads(line))
+    df = pd.DataFrame(data)
+    df['name'] = df['name'].apply(lambda x: re.sub(r'[^\w\s]', '', x) if isinstance(x, str) else x)
+    df['address'] = df['address'].apply(lambda x: re.sub(r'[^a-zA-Z\s]', '', x) if isinstance(x, str) else x)
+    df['country'] = df['address'].apply(lambda x: x.split()[-1] if isinstance(x, str) else None)
+    df['description'] = df['description'].apply(lambda x: re.sub(r'[^a-zA-Z\s]', '', x) if isinstance(x, str) else x)
+    df['latitude and longitude'] = df['latitude and longitude'].apply(lambda x: re.sub(r'[^\w\s]', '', x) if isinstance(x, str) else x)
+    df['food type'] = df['food type'].apply(lambda x: re.sub(r'[^\w\s]', '', x) if isinstance(x, str) else x)
+
+    def extract_stars_label(stars):
+        if isinstance(stars, str):
+            if stars.startswith("Three Stars"):
+                return 3
+            elif stars.startswith("Two Stars"):
+                return 2
+            elif stars.startswith("One Star"):
+                return 1
+            elif stars.startswith("Bib"):
+                return 0
+        return None
+
+    df['stars_label'] = df['stars'].apply(extract_stars_label)
+    df['price_symbol_count'] = df['price'].apply(lambda price: len(re.findall(r'[^\w\s]', price)) if isinstance(price, str) else None)
+    df = df.drop(columns=['price', 'stars'], errors='ignore')
+    df.to_csv(output_path, index=False)
+    iso_country_codes = pd.read_csv(iso_path)
+    country_to_iso = dict(zip(iso_country_codes['Country'], iso_country_codes['ISO Code']))
+    df['country'] = df['country'].apply(lambda country: country.encode('latin1').decode('utf-8') if isinstance(country, str) else country)
+    df['country'] = df['country'].replace(unmapped_countries)
+    df['ISO Code'] = df['country'].map(country_to_iso)
+    df.reset_index(inplace=True)
+    df.rename(columns={"index": "UniqueID"}, inplace=True)
+    df.to_csv(output_path, index=False)
+    return df
+
+
+def timed(label, rows, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12}{elapsed:>10.2f} s{rows / elapsed:>14,.0f} rows/sec")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_path = os.path.join(folder, "raw_results.json")
+        write_synthetic(input_path, args.rows)
+        print(f"{args.rows:,} synthetic rows")
+
+        if args.chunksize:
+            # Runs first so that the peak RSS below is not inflated by the in-memory runs.
+            output_path = os.path.join(folder, "chunked.csv")
+            timed("chunked", args.rows, clean, input_path, output_path, iso_country_codes_path, args.chunksize, args.workers)
+            print(f"{'':<12}peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MiB")
+        timed("vectorized", args.rows, clean, input_path, os.path.join(folder, "cleaned.csv"), iso_country_codes_path)
+        df = clean_frame(load_jsonl_data(input_path), pd.read_csv(iso_country_codes_path))
+        print(f"{'':<12}in-memory size {df.memory_usage(deep=True).sum() / 2**20:,.0f} MiB")
+        if args.legacy:
+            legacy = timed("legacy", args.rows, legacy_clean, input_path, os.path.join(folder, "legacy.csv"), iso_country_codes_path)
+            print(f"{'':<12}in-memory size {legacy.memory_usage(deep=True).sum() / 2**20:,.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
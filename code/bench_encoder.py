@@ -0,0 +1,127 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from model_registry import MODEL_NAME, ONNX_FILES, export_onnx, get_model, onnx_root
+
+# Latency, memory and parity of the query encoder backends (model_registry.ENCODER_BACKENDS).
+# Usage: python3 code/bench_encoder.py [--backend torch --backend onnx --backend onnx-int8] [--queries 200]
+#        [--artifacts] [--min-cosine 0.99]
+# Each backend runs in its own interpreter, so the peak RSS column is that backend's alone. The ONNX files are
+# exported first if missing. Parity is the cosine similarity of every query's embedding to the torch one; the
+# script exits with status 1 when one falls below --min-cosine.
+
+QUERIES = [
+    "cozy Italian bistro with pasta", "sushi counter omakase", "romantic dinner with a view of the sea",
+    "vegetarian tasting menu", "traditional French brasserie", "modern Nordic cuisine with local produce",
+    "dim sum in Hong Kong", "steakhouse with an extensive wine list", "family-run trattoria in the countryside",
+    "creative fusion small plates", "seafood restaurant by the harbour", "three star fine dining in Paris",
+]
+
+
+def query_texts(count, use_artifacts=False, seed=0):
+    if use_artifacts:
+        from artifacts import load_restaurants
+
+        texts = load_restaurants()["description"].dropna().tolist()
+    else:
+        texts = QUERIES
+    rng = np.random.default_rng(seed)
+    return [texts[position] for position in rng.integers(0, len(texts), count)]
+
+
+def worker(backend, texts, output, batch_size):
+    """Load `backend`, time single and batched encodes of `texts`, save their embeddings to `output`."""
+    start = time.perf_counter()
+    model = get_model(MODEL_NAME, backend)
+    model.encode(["warm up"])
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        model.encode([text])
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    batch_seconds = time.perf_counter() - start
+    np.save(output, embeddings)
+
+    latencies = np.array(latencies) * 1000
+    print(json.dumps({
+        "load_seconds": load_seconds, "p50_ms": float(np.median(latencies)), "p99_ms": float(np.percentile(latencies, 99)),
+        "batch_qps": len(texts) / batch_seconds, "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def run_worker(backend, args, folder):
+    output = Path(folder) / f"{backend}.npy"
+    command = [
+        sys.executable, __file__, "--worker", backend, "--output", str(output), "--queries", str(args.queries),
+        "--batch-size", str(args.batch_size),
+    ] + (["--artifacts"] if args.artifacts else [])
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"{backend} failed")
+    return json.loads(process.stdout.strip().splitlines()[-1]), np.load(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", action="append", choices=["torch", *ONNX_FILES], default=[])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--artifacts", action="store_true", help="encode restaurant descriptions instead of short queries")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    texts = query_texts(args.queries, args.artifacts)
+    if args.worker:
+        worker(args.worker, texts, args.output, args.batch_size)
+        return
+
+    backends = args.backend or ["torch", *ONNX_FILES]
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+    if any(not (onnx_root / MODEL_NAME / ONNX_FILES[backend]).exists() for backend in backends if backend != "torch"):
+        export_onnx(MODEL_NAME, quantize="onnx-int8" in backends)
+
+    print(f"{args.queries} texts, batches of {args.batch_size}")
+    print(f"{'':<11}{'load':>9}{'peak RSS':>13}{'p50':>11}{'p99':>11}{'batched':>14}{'min cos':>10}{'mean cos':>10}")
+    failed = []
+    with tempfile.TemporaryDirectory() as folder:
+        reference = None
+        for backend in backends:
+            try:
+                stats, embeddings = run_worker(backend, args, folder)
+            except RuntimeError as error:
+                print(f"{backend:<11}failed: {error}")
+                continue
+            if backend == "torch":
+                reference = embeddings
+            parity = ""
+            if reference is not None:
+                cosine = (embeddings * reference).sum(axis=1) / (
+                    np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1))
+                parity = f"{cosine.min():>10.5f}{cosine.mean():>10.5f}"
+                if cosine.min() < args.min_cosine:
+                    failed.append(backend)
+            print(f"{backend:<11}{stats['load_seconds']:>7.2f} s{stats['rss_mib']:>9.0f} MiB{stats['p50_ms']:>8.2f} ms"
+                  f"{stats['p99_ms']:>8.2f} ms{stats['batch_qps']:>10.0f} q/s{parity}")
+
+    if failed:
+        print(f"Cosine similarity to torch below {args.min_cosine}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
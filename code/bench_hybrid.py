@@ -0,0 +1,86 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from artifacts import artifacts_dir, PARQUET_NAME, load_embedding_matrix
+from keyword_index import FIELDS, KeywordIndex, reciprocal_rank_fusion
+from vector_index import VectorIndex
+
+# Latency and size benchmark of the BM25 keyword index and of hybrid (BM25 + vector) ranking.
+# Usage: python3 code/bench_hybrid.py [--rows 100000] [--queries 500] [--artifacts]
+# --artifacts indexes the real cleaned restaurants; otherwise the text is drawn from a Zipf-distributed
+# synthetic vocabulary and the embeddings are random.
+
+CUISINES = ["French", "Japanese", "Italian", "Vegetarian", "Seafood", "Modern Cuisine", "Creative"]
+
+
+def synthetic(rows, vocabulary=20_000, words=40, seed=0):
+    rng = np.random.default_rng(seed)
+    terms = np.array([f"word{number}" for number in range(vocabulary)])
+    draws = terms[(rng.zipf(1.3, size=(rows, words)) - 1) % vocabulary]
+    df = pd.DataFrame({
+        "UniqueID": np.arange(rows),
+        "name": [f"Restaurant {number}" for number in range(rows)],
+        "description": [" ".join(row) for row in draws],
+        "food type": rng.choice(CUISINES, rows),
+        "facilities_services": "['Air conditioning', 'Terrace']",
+    })
+    return df, rng.normal(size=(rows, 384)).astype(np.float32)
+
+
+def percentiles(latencies):
+    latencies = np.array(latencies) * 1000
+    return f"p50 {np.median(latencies):.3f} ms, p99 {np.percentile(latencies, 99):.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--artifacts", action="store_true")
+    args = parser.parse_args()
+
+    if args.artifacts:
+        df = pd.read_parquet(artifacts_dir / PARQUET_NAME, columns=["UniqueID", *FIELDS])
+        ids, matrix = load_embedding_matrix(artifacts_dir, mmap=False)
+    else:
+        df, matrix = synthetic(args.rows)
+        ids = df["UniqueID"].to_numpy()
+    rng = np.random.default_rng(1)
+    texts = df["description"].dropna().to_numpy()
+    # Queries are three words taken from random descriptions.
+    queries = [" ".join(rng.choice(texts[rng.integers(len(texts))].split(), 3)) for _ in range(args.queries)]
+    print(f"{len(df):,} restaurants, {args.queries} queries")
+
+    start = time.perf_counter()
+    keywords = KeywordIndex.build(df)
+    print(f"build             {time.perf_counter() - start:.2f} s, {len(keywords.vocabulary):,} terms, {len(keywords.documents):,} postings")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bm25.npz")
+        keywords.save(path)
+        print(f"size              {keywords.nbytes() / 2**20:.1f} MiB in memory, {os.path.getsize(path) / 2**20:.1f} MiB on disk")
+
+    vectors = VectorIndex(ids, matrix)
+    query_vectors = rng.normal(size=(args.queries, matrix.shape[1])).astype(np.float32)
+    bm25, vector, hybrid = [], [], []
+    for query, query_vector in zip(queries, query_vectors):
+        start = time.perf_counter()
+        positions, _ = keywords.search(query, 100)
+        middle = time.perf_counter()
+        vector_positions, _ = vectors.search(query_vector, 100)
+        end = time.perf_counter()
+        reciprocal_rank_fusion(vectors.ids[vector_positions].tolist(), keywords.ids[positions].tolist())
+        bm25.append(middle - start)
+        vector.append(end - middle)
+        hybrid.append(time.perf_counter() - start)
+    print(f"bm25 top-100      {percentiles(bm25)}")
+    print(f"vector top-100    {percentiles(vector)}")
+    print(f"hybrid (fused)    {percentiles(hybrid)}")
+
+
+if __name__ == "__main__":
+    main()
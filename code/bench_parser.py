@@ -0,0 +1,112 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+
+from common import parse_html
+from fixture_server import render_restaurant
+from res_parser import available_backends, extract
+from scrape_res import (
+    get_name, get_address, get_country, get_price, get_type_food,
+    get_stars, get_description, get_facilities_services_info,
+)
+
+# Micro-benchmark of the restaurant page parsers.
+# Usage: python3 code/bench_parser.py [--pages-dir data/fixtures] [--repeat 5]
+# Without --pages-dir the pages come from the local stand-in site in fixture_server.py.
+# Every parser runs in a fresh process. "peak RSS" is that process's absolute peak, next to an idle process that
+# loads the same pages and imports the same modules without parsing; "above idle" is the difference, which counts
+# the C allocations of lxml and selectolax. "Python heap" is the tracemalloc peak of parsing every page once
+# (Python objects only), measured after the timed loop so tracing does not slow it down.
+
+
+def parse_with_getters(html):
+    """The original way: one html.parser soup, then a separate find_all per field."""
+    soup = parse_html(html)
+    return {
+        "name": get_name(soup),
+        "address": get_address(soup),
+        "country": get_country(soup),
+        "price": get_price(soup),
+        "stars": get_stars(soup),
+        "description": get_description(soup),
+        "facilities_services": get_facilities_services_info(soup),
+        "food type": get_type_food(soup),
+    }
+
+
+def load_pages(pages_dir, count):
+    if pages_dir:
+        paths = sorted(glob.glob(os.path.join(pages_dir, "*.html")))
+        pages = []
+        for path in paths:
+            with open(path, encoding="utf-8") as file:
+                pages.append(file.read())
+        return pages
+    return [render_restaurant(num) for num in range(count)]
+
+
+def run(name, pages, repeat, queue):
+    """Parses every page `repeat` times and reports pages/sec, the peak RSS in KB and the Python heap peak in KB."""
+    if name == "idle":
+        queue.put((name, None, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, None))
+        return
+    backend, _, strain = name.partition("+")
+
+    def parse(html):
+        if name == "getters":
+            return parse_with_getters(html)
+        return extract(html, backend=backend, strain=bool(strain))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    for html in pages:
+        parse(html)
+    heap_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queue.put((name, len(pages) * repeat / elapsed, peak_rss, heap_peak // 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages-dir", default=None)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir, args.count)
+    expected = parse_with_getters(pages[0])
+    candidates = ["getters", "html.parser+strain"] + available_backends()
+    for name in candidates[1:]:
+        backend, _, strain = name.partition("+")
+        assert extract(pages[0], backend=backend, strain=bool(strain)) == expected, f"{name} disagrees with the getters"
+
+    # Each parser runs in a fresh process so that peak RSS is not shared between them.
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    print(f"{len(pages)} pages x {args.repeat}")
+    print(f"{'parser':<22}{'pages/sec':>12}{'peak RSS (KB)':>16}{'above idle (KB)':>18}{'Python heap (KB)':>19}")
+    idle_rss = None
+    for name in ["idle"] + candidates:
+        process = context.Process(target=run, args=(name, pages, args.repeat, queue))
+        process.start()
+        name, rate, peak_rss, heap_peak = queue.get()
+        process.join()
+        if idle_rss is None:
+            idle_rss = peak_rss
+            print(f"{name:<22}{'':>12}{peak_rss:>16}{0:>18}{'':>19}")
+        else:
+            print(f"{name:<22}{rate:>12.1f}{peak_rss:>16}{peak_rss - idle_rss:>18}{heap_peak:>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from artifacts import artifacts_dir, load_embedding_matrix
+from bench_ann import queries_from, synthetic
+from vector_index import QuantizedIndex, VectorIndex
+
+# Memory, latency and recall@20 of the compressed embedding storage modes against float32 exact search.
+# Usage: python3 code/bench_quantization.py [--rows 100000] [--queries 500] [--artifacts]
+# The full-precision rows used for rescoring are memory-mapped from a temporary .npy file, as match.py
+# maps embeddings.npy, so they are not counted in the memory column.
+
+
+def run(label, index, queries, truth, k, memory):
+    """Search one query at a time, as match() does, and print memory, latency percentiles and recall@k."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        positions, _ = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(np.intersect1d(index.ids[positions], expected))
+    latencies = np.array(latencies) * 1000
+    print(f"{label:<26}{memory / 2**20:>9.1f} MiB{np.median(latencies):>9.3f} ms{np.percentile(latencies, 99):>9.3f} ms"
+          f"{hits / (k * len(queries)):>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--artifacts", action="store_true")
+    args = parser.parse_args()
+
+    if args.artifacts:
+        ids, matrix = load_embedding_matrix(artifacts_dir, mmap=False)
+    else:
+        matrix = synthetic(args.rows)
+        ids = np.arange(len(matrix))
+    queries = queries_from(matrix, args.queries)
+    print(f"{len(matrix):,} rows, {args.queries} queries, recall@{args.k}")
+
+    exact = VectorIndex(ids, matrix)
+    truth = [exact.ids[positions] for positions, _ in exact.search_batch(queries, args.k)]
+    print(f"{'':<26}{'memory':>13}{'p50':>12}{'p99':>12}{'recall':>9}")
+    run("float32", exact, queries, truth, args.k, exact.matrix.nbytes)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "embeddings.npy")
+        np.save(path, matrix)
+        source = np.load(path, mmap_mode="r")
+        for storage, rescore in [("float16", False), ("int8", False), ("int8", True)]:
+            index = QuantizedIndex.build(ids, source, storage, rescore=rescore)
+            run(storage + (" + rescore" if rescore else ""), index, queries, truth, args.k, index.nbytes())
+        for oversample in (5, 10, 30):
+            index = QuantizedIndex.build(ids, source, "binary", oversample=oversample)
+            run(f"binary, rescore {oversample}x", index, queries, truth, args.k, index.nbytes())
+        del source, index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from filters import haversine_km
+from spatial_index import ClusterGrid, SpatialIndex, viewport
+
+# Benchmark of nearest-restaurant lookups on synthetic points.
+# Usage: python3 code/bench_spatial.py [--points 100000] [--queries 200]
+# Compares the BallTree index with the original full scan (GeoSeries.apply(distance) and a sort of the
+# whole frame, when geopandas is installed) and with a vectorized haversine scan, then times the map clusters:
+# markers drawn per 800x600 px viewport at several zoom levels, against one marker per restaurant.
+
+try:
+    import geopandas as gpd
+    from shapely.geometry import Point
+except ImportError:
+    gpd = None
+
+
+def timed(label, queries, func):
+    start = time.perf_counter()
+    for latitude, longitude in queries:
+        func(latitude, longitude)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    print(f"{label:<26}{elapsed * 1000:>10.3f} ms/query")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius", type=float, default=5.0, help="radius in km for the radius queries")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "name": [f"Restaurant {number}" for number in range(args.points)],
+        # Clustered around 200 "cities", like the real data.
+        "latitude": np.repeat(rng.uniform(-60, 70, 200), args.points // 200) + rng.normal(0, 0.05, args.points // 200 * 200),
+        "longitude": np.repeat(rng.uniform(-180, 180, 200), args.points // 200) + rng.normal(0, 0.05, args.points // 200 * 200),
+    })
+    queries = frame[["latitude", "longitude"]].to_numpy()[rng.integers(0, len(frame), args.queries)] + rng.normal(0, 0.01, (args.queries, 2))
+    print(f"{len(frame):,} points, {args.queries} queries, k={args.k}")
+
+    start = time.perf_counter()
+    index = SpatialIndex(frame)
+    print(f"{'balltree build':<26}{time.perf_counter() - start:>10.3f} s")
+
+    # The index must agree with an exact scan.
+    for latitude, longitude in queries[:20]:
+        expected = np.sort(haversine_km(frame["latitude"], frame["longitude"], latitude, longitude))[:args.k]
+        assert np.allclose(index.nearest(latitude, longitude, args.k)["distance_km"].to_numpy(), expected)
+
+    timed("balltree k-nearest", queries, lambda lat, lng: index.nearest(lat, lng, args.k))
+    timed(f"balltree radius {args.radius:g} km", queries, lambda lat, lng: index.within(lat, lng, args.radius))
+    timed("haversine scan + sort", queries, lambda lat, lng: frame.assign(
+        distance_km=haversine_km(frame["latitude"].to_numpy(), frame["longitude"].to_numpy(), lat, lng)
+    ).sort_values("distance_km").head(args.k))
+
+    start = time.perf_counter()
+    clusters = ClusterGrid(frame)
+    print(f"{'cluster grid build':<26}{time.perf_counter() - start:>10.3f} s, zoom 0-{clusters.max_zoom}")
+    for zoom in (2, 5, 8, 11, 14):
+        views = [viewport(latitude, longitude, zoom, 800, 600) for latitude, longitude in queries]
+        start = time.perf_counter()
+        counts = [len(clusters.markers(*bounds, zoom)) for bounds in views]
+        elapsed = (time.perf_counter() - start) / len(views)
+        print(f"{f'viewport zoom {zoom}':<26}{elapsed * 1000:>10.3f} ms/view, {np.mean(counts):.0f} markers on average (max {max(counts)})")
+
+    if gpd is None:
+        print("geopandas is not installed, skipping the original apply-based scan")
+        return
+    gdf = gpd.GeoDataFrame(frame, geometry=gpd.points_from_xy(frame.longitude, frame.latitude))
+
+    def legacy(latitude, longitude):
+        point = Point(longitude, latitude)
+        distances = gdf.geometry.apply(lambda x: point.distance(x))
+        return gdf.assign(distance=distances).sort_values("distance").head(args.k)
+
+    timed("original apply + sort", queries[:max(1, args.queries // 20)], legacy)
+
+
+if __name__ == "__main__":
+    main()
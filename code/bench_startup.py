@@ -0,0 +1,98 @@
+import argparse
+import ast
+import subprocess
+import sys
+from pathlib import Path
+
+# Cold-start import cost of the app and of the modules it loads, measured with `python -X importtime` in a fresh
+# interpreter per target so nothing is already imported.
+# Usage: python3 code/bench_startup.py [--top 10] [--repeat 3] [--budget-ms 0] [module ...]
+# Without modules it profiles the top-level imports of app.py and the code modules the app uses. With
+# --budget-ms the script exits with status 1 when any target's median import time exceeds the budget.
+# A target that fails to import always makes it exit with status 1.
+
+project_root = Path(__file__).resolve().parent.parent
+DEFAULT_MODULES = [
+    "code.database", "code.repository", "code.country_statistics", "code.model_registry", "code.match_sql",
+    "code.gis_utils",
+]
+
+
+def app_imports(path=project_root / "app.py"):
+    """The import statements at the top level of app.py, i.e. what runs before the page starts rendering."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def import_times(source, startup=()):
+    """
+    Run `source` in a fresh interpreter with -X importtime. Return the time spent importing in ms and
+    {module: cumulative ms}, leaving out the `startup` modules every interpreter imports before running the
+    source, or raise RuntimeError with the interpreter's error when an import fails.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", source], cwd=project_root, capture_output=True, text=True,
+    )
+    total, modules, errors = 0, {}, []
+    for line in process.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:"):
+            errors.append(line)
+        elif len(fields) == 3 and fields[1].strip().isdigit():
+            name, cumulative = fields[2].rstrip(), int(fields[1]) / 1000
+            if name.strip() in startup:
+                continue
+            modules[name.strip()] = max(modules.get(name.strip(), 0), cumulative)
+            # Modules imported by the target itself (the least indented) add up to the total.
+            if not name.startswith("  "):
+                total += cumulative
+    if process.returncode != 0:
+        raise RuntimeError("\n".join(errors[-5:]))
+    return total, modules
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", help="modules to import, e.g. code.match_sql (default: app.py and its modules)")
+    parser.add_argument("--top", type=int, default=10, help="slowest imported modules to list per target")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per target; the median is reported")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail when a target takes longer (0 = no budget)")
+    args = parser.parse_args()
+
+    targets = [(module, f"import {module}") for module in args.modules]
+    if not targets:
+        targets = [("app.py imports", app_imports())] + [(module, f"import {module}") for module in DEFAULT_MODULES]
+
+    startup = set(import_times("pass")[1])
+    over_budget, failed = [], []
+    for label, source in targets:
+        try:
+            runs = [import_times(source, startup) for _ in range(args.repeat)]
+        except RuntimeError as error:
+            print(f"{label}: import failed\n{error}\n")
+            failed.append(label)
+            continue
+        total = median([run[0] for run in runs])
+        print(f"{label}: {total:.1f} ms")
+        slowest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, cumulative in slowest:
+            print(f"    {cumulative:>9.1f} ms  {name}")
+        print()
+        if args.budget_ms and total > args.budget_ms:
+            over_budget.append(label)
+
+    if failed:
+        print(f"Import failed: {', '.join(failed)}")
+    if over_budget:
+        print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+    if failed or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from code.artifacts import DB_COLUMNS, artifacts_dir, load_embedding_matrix, load_restaurants, to_pgvector
+from code.database import get_engine
+from code.migrations import apply_migrations
+
+
+TABLE = "cleaned_data_with_embeddings"
+STAGING = "restaurants_staging"
+INTEGER_COLUMNS = ["stars_label", "price_symbol_count"]
+
+# The table of sql/create_table.sql for a first load; the migrations add the location column and the indexes.
+CREATE_TABLE = f"""
+    CREATE EXTENSION IF NOT EXISTS vector;
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        uniqueid VARCHAR(255) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        address TEXT,
+        description TEXT,
+        facilities_services TEXT,
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION,
+        food_type VARCHAR(100),
+        country VARCHAR(100),
+        stars_label INTEGER,
+        price_symbol_count INTEGER,
+        iso_code CHAR(10),
+        embedding vector(384)
+    );
+    -- Tables created by pandas.to_sql have no key to upsert on.
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = '{TABLE}'::regclass AND i.indisunique AND i.indnatts = 1 AND a.attname = 'uniqueid'
+        ) THEN
+            CREATE UNIQUE INDEX uniqueid_idx ON {TABLE} (uniqueid);
+        END IF;
+    END $$;
+"""
+
+# Loadable columns: everything but generated ones like location.
+TABLE_COLUMNS_QUERY = f"""
+    SELECT column_name FROM information_schema.columns
+    WHERE table_name = '{TABLE}' AND is_generated = 'NEVER'
+"""
+
+DELETE_MISSING = f"""
+    DELETE FROM {TABLE} t
+    WHERE NOT EXISTS (SELECT 1 FROM {STAGING} s WHERE s.uniqueid = t.uniqueid)
+"""
+
+# Rows that did not change are left alone, so they keep their index entries and leave no dead tuples.
+UPSERT = """
+    INSERT INTO {table} ({columns})
+    SELECT {columns} FROM {staging}
+    ON CONFLICT (uniqueid) DO UPDATE SET {assignments}
+    WHERE ({current}) IS DISTINCT FROM ({excluded})
+    RETURNING xmax = 0
+"""
+
+
+def restaurant_rows(path=artifacts_dir):
+    """
+    The cleaned restaurants with their pgvector embeddings, from the artifacts written by code/embedding.py,
+    with database column names.
+    """
+    ids, embeddings = load_embedding_matrix(path)
+    df = load_restaurants(path)
+    df["embedding"] = pd.Series(to_pgvector(embeddings), index=ids).reindex(df["UniqueID"]).to_numpy()
+    return df.rename(columns=DB_COLUMNS)
+
+
+def copy_chunks(cursor, df, columns, chunk_rows):
+    """Stream the frame into the staging table as CSV, one COPY per chunk of rows."""
+    copy = f"COPY {STAGING} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(df), chunk_rows):
+        buffer = io.StringIO()
+        df.iloc[start:start + chunk_rows].to_csv(buffer, columns=columns, header=False, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy, buffer)
+
+
+def bulk_upsert(df, engine=None, chunk_rows=50_000, delete_missing=True):
+    """
+    Load a frame of restaurants (database column names, embeddings as pgvector text) into the table without
+    replacing it: the rows are COPY'd into a temporary staging table, then, in the same transaction, rows
+    missing from the frame are deleted and the others inserted or updated by uniqueid. The table keeps its
+    vector(384) type, generated location column, indexes and dependent views, and readers see the old rows
+    until the commit. Return counts and the load rate in rows per second.
+    """
+    engine = engine or get_engine()
+    df = df.copy()
+    for column in INTEGER_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce").round().astype("Int64")
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("SET LOCAL statement_timeout = 0")
+        conn.exec_driver_sql(CREATE_TABLE)
+        table_columns = {row[0] for row in conn.exec_driver_sql(TABLE_COLUMNS_QUERY)}
+        columns = [column for column in df.columns if column in table_columns]
+        conn.exec_driver_sql(f"CREATE TEMP TABLE {STAGING} (LIKE {TABLE} INCLUDING DEFAULTS) ON COMMIT DROP")
+
+        copy_chunks(conn.connection.cursor(), df, columns, chunk_rows)
+        copied = time.perf_counter()
+
+        deleted = conn.exec_driver_sql(DELETE_MISSING).rowcount if delete_missing else 0
+        updated_columns = [column for column in columns if column != "uniqueid"]
+        upsert = UPSERT.format(
+            table=TABLE, staging=STAGING, columns=", ".join(columns),
+            assignments=", ".join(f"{column} = EXCLUDED.{column}" for column in updated_columns),
+            current=", ".join(f"{TABLE}.{column}" for column in updated_columns),
+            excluded=", ".join(f"EXCLUDED.{column}" for column in updated_columns),
+        )
+        written = [row[0] for row in conn.exec_driver_sql(upsert)]
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": len(df), "inserted": sum(written), "updated": len(written) - sum(written), "deleted": deleted,
+        "copy_seconds": copied - start, "seconds": elapsed, "rows_per_sec": len(df) / elapsed if elapsed else 0.0,
+    }
+
+
+def print_stats(stats):
+    print(
+        f"Loaded {stats['rows']:,} rows in {stats['seconds']:.2f} s ({stats['rows_per_sec']:,.0f} rows/sec, "
+        f"COPY {stats['copy_seconds']:.2f} s): {stats['inserted']:,} inserted, {stats['updated']:,} updated, "
+        f"{stats['deleted']:,} deleted."
+    )
+
+
+if __name__ == "__main__":
+    # Usage: python3 -m code.bulk_load [--path artifacts] [--chunk-rows 50000] [--keep-missing]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=str(artifacts_dir), help="folder with the artifacts of code/embedding.py")
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--keep-missing", action="store_true", help="do not delete rows missing from the artifacts")
+    args = parser.parse_args()
+    engine = get_engine()
+    print_stats(bulk_upsert(restaurant_rows(args.path), engine, args.chunk_rows, not args.keep_missing))
+    apply_migrations(engine)
@@ -1,14 +1,73 @@
+import threading
+import time
+
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+
+class RateLimiter:
+
+    """Spaces out calls so that each key (a host, an API, ...) is used at most `rate` times per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, key=""):
+        """Blocks until the key has a free slot."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(key, now))
+            self.next_slot[key] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size=10, retries=3, backoff=0.5):
+
+    """Returns a requests.Session that keeps connections alive and retries transient failures with exponential backoff."""
+
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def parse_html(html):
+
+    """Takes the HTML of a page and returns a BeautifulSoup() instance representing it."""
+
+    return BeautifulSoup(html, "html.parser")
+
+
+def get_html(url, session=None):
+
+    """Takes a URL and returns the HTML of the page as a string."""
 
+    response = (session or requests).get(url)
+    return response.text
 
 
-def get_soup(url):
+def get_soup(url, session=None):
     
     """Takes a URL and returns a BeautifulSoup() instance representing the HTML of the page."""
 
-    response = requests.get(url)
-    html = response.text
-    soup = BeautifulSoup(html, "html.parser")
+    html = get_html(url, session)
+    soup = parse_html(html)
 
     return soup
@@ -0,0 +1,56 @@
+import threading
+
+import pandas as pd
+
+from code.database import get_engine, statement
+
+
+# Both read the tables of sql/migrations/004_country_statistics.sql.
+STATISTICS_QUERY = """
+    SELECT iso_code, country, total_michelin, zero_star, one_star, two_star, three_star
+    FROM country_statistics
+    ORDER BY total_michelin DESC
+"""
+REFRESHED_AT_QUERY = "SELECT refreshed_at FROM view_refreshes WHERE view_name = 'country_statistics'"
+
+
+def hover_text(data):
+    """The world map's hover text of every country, built column-wise."""
+    return (
+        "<b>" + data["country"].astype(str) + "</b><br>Total Restaurants: " + data["total_michelin"].astype(str) + "<br>"
+        + "0 Stars: " + data["zero_star"].astype(str) + "<br>"
+        + "1 Star: " + data["one_star"].astype(str) + "<br>"
+        + "2 Stars: " + data["two_star"].astype(str) + "<br>"
+        + "3 Stars: " + data["three_star"].astype(str) + "<br>"
+    )
+
+
+class CountryStatistics:
+    """
+    In-process copy of the country_statistics view, with its hover text. `load` only asks the database when
+    the view was last refreshed, and reads the view again when that changed (after an ingest) or after
+    `invalidate`. The returned frame is shared between callers and must not be modified.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+        self.lock = threading.Lock()
+        self.refreshed_at = None
+        self.data = None
+
+    def load(self):
+        with self.engine.connect() as connection:
+            refreshed_at = connection.execute(statement(REFRESHED_AT_QUERY)).scalar()
+            with self.lock:
+                if self.data is not None and refreshed_at == self.refreshed_at:
+                    return self.data
+            result = connection.execute(statement(STATISTICS_QUERY))
+            data = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        data["hover_text"] = hover_text(data)
+        with self.lock:
+            self.data, self.refreshed_at = data, refreshed_at
+        return data
+
+    def invalidate(self):
+        with self.lock:
+            self.data = None
@@ -0,0 +1,131 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urljoin, urlparse
+
+from common import RateLimiter, make_session, parse_html
+from ledger import conditional_headers
+from scrape_pages import URL, parse_page_links
+from scrape_res import parse_res, lookup_lat_long
+
+
+class Crawler:
+    """
+    Crawls the listing pages and the restaurant pages concurrently over a shared keep-alive session.
+    Links found on each listing page are handed to the worker pool straight away, so detail pages
+    are fetched while the next listing page is still being discovered.
+    With a FetchLedger, restaurant pages are fetched with conditional requests, unchanged pages are not
+    parsed again, and an interrupted run picks up where it stopped.
+    """
+
+    def __init__(self, listing_url=URL, concurrency=8, rate=5.0, retries=3, backoff=0.5, geocode=lookup_lat_long,
+                 ledger=None, resume=True):
+        self.listing_url = listing_url
+        self.base_url = urljoin(listing_url, "/")
+        self.concurrency = concurrency
+        self.geocode = geocode
+        self.ledger = ledger
+        self.resume = resume
+        self.run_id = None
+        self.failures = 0
+        self.limiter = RateLimiter(rate)
+        self.session = make_session(pool_size=concurrency, retries=retries, backoff=backoff)
+
+    def fetch(self, url):
+        """
+        Returns the HTML of a url once the rate limiter allows it. An error status raises, so a blocked or
+        missing page counts as a failure instead of parsing as an empty one.
+        """
+        self.limiter.wait(urlparse(url).netloc)
+        response = self.session.get(url)
+        response.raise_for_status()
+        return response.text
+
+    def scrape_page(self, num):
+        """Returns the restaurant links on listing page `num`."""
+        return parse_page_links(parse_html(self.fetch(self.listing_url + str(num))), self.base_url)
+
+    def scrape_res(self, res_url):
+        """Returns the restaurant dictionary for one restaurant page."""
+        if self.ledger is None:
+            return parse_res(self.fetch(res_url), self.geocode)
+
+        entry = self.ledger.get(res_url)
+        if entry and entry["run_id"] == self.run_id:
+            return entry["result"]
+
+        self.limiter.wait(urlparse(res_url).netloc)
+        response = self.session.get(res_url, headers=conditional_headers(entry))
+        if response.status_code == 304:
+            self.ledger.mark_unchanged(res_url, self.run_id)
+            return entry["result"]
+        response.raise_for_status()
+
+        known = entry is not None and entry["status"] != "removed"
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if known and entry["content_hash"] == content_hash:
+            self.ledger.mark_unchanged(res_url, self.run_id)
+            return entry["result"]
+
+        result = parse_res(response.text, self.geocode)
+        self.ledger.record(
+            res_url,
+            self.run_id,
+            result,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            content_hash=content_hash,
+            status="changed" if known else "new",
+        )
+        return result
+
+    def crawl(self):
+        """Yields restaurant dictionaries as their pages finish downloading."""
+        if self.ledger is not None:
+            self.run_id = self.ledger.start_run(self.resume)
+        self.failures = 0
+        seen = set()
+        pending = set()
+        page = 1
+        try:
+            with ThreadPoolExecutor(max_workers=1) as listings, ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                listing = listings.submit(self.scrape_page, page)
+                while listing is not None or pending:
+                    done, _ = wait(pending | {listing} if listing else pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future is listing:
+                            listing = None
+                            try:
+                                links = future.result()
+                            except Exception as e:
+                                # Without this page the later ones cannot be reached, so pagination stops here.
+                                print(f"Failed to scrape listing page {page}: {e}")
+                                self.failures += 1
+                                continue
+                            if links:
+                                page += 1
+                                listing = listings.submit(self.scrape_page, page)
+                            for link in links:
+                                if link not in seen:
+                                    seen.add(link)
+                                    task = pool.submit(self.scrape_res, link)
+                                    task.url = link
+                                    pending.add(task)
+                        else:
+                            pending.discard(future)
+                            try:
+                                res = future.result()
+                            except Exception as e:
+                                print(f"Failed to scrape {future.url}: {e}")
+                                self.failures += 1
+                                continue
+                            yield res
+
+            # A run with failed pages stays open, so the next run retries them instead of reporting them removed.
+            if self.ledger is not None and not self.failures:
+                self.ledger.finish_run(self.run_id)
+        finally:
+            self.session.close()
+
+def crawl(listing_url=URL, concurrency=8, rate=5.0, **kwargs):
+    """Crawls every restaurant reachable from the listing pages and returns a list of restaurants."""
+    return list(Crawler(listing_url, concurrency=concurrency, rate=rate, **kwargs).crawl())
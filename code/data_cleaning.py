@@ -1,7 +1,9 @@
 import pandas as pd
+import numpy as np
+import argparse
 import re
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 # Define relative paths
 artifacts_folder = './artifacts'
@@ -10,107 +12,284 @@ input_jsonl_path = os.path.join(data_folder, 'raw_results.json')
 iso_country_codes_path = os.path.join(artifacts_folder, 'iso_country_codes.csv')
 output_clean_data_path = os.path.join(artifacts_folder, 'cleaned_data.csv')
 
-# Create artifacts directory if it doesn't exist
-os.makedirs(artifacts_folder, exist_ok=True)
+# Patterns are compiled once and reused by the vectorized .str methods
+NON_WORD = re.compile(r'[^\w\s]')
+NON_LETTER = re.compile(r'[^a-zA-Z\s]')
+# The geocoder result, {'lat': .., 'lng': ..}, as a dict or as its text
+COORDINATES = re.compile(r"'lat':\s*(?P<latitude>-?[\d.eE+-]+).*?'lng':\s*(?P<longitude>-?[\d.eE+-]+)")
 
-# Step 1: Load the JSONL file and generate clean_data.csv
-data = []
-with open(input_jsonl_path, 'r', encoding='utf-8') as file:
-    for line in file:
-        data.append(json.loads(line))
+# Define a mapping for unmapped countries
+unmapped_countries = {
+    "Mainland": "China",
+    "Kong": "Hong Kong",
+    "Dhabi": "United Arab Emirates",
+    "Dubai": "United Arab Emirates",
+    "Kingdom": "United Kingdom of Great Britain and Northern Ireland",
+    "Korea": "Korea, Republic of",
+    "Macau": "Macao",
+    "Netherlands": "Netherlands, Kingdom of the",
+    "Republic": "Czechia",
+    "Trkiye": "Türkiye",
+    "USA": "United States of America",
+    "Vietnam": "Viet Nam",
+}
 
-# Convert to DataFrame
-df = pd.DataFrame(data)
+# Michelin distinctions and their numeric label, checked in order with str.startswith
+STAR_PREFIXES = [("Three Stars", 3), ("Two Stars", 2), ("One Star", 1), ("Bib", 0)]
 
-# Clean "name" column: remove weird symbols
-df['name'] = df['name'].apply(lambda x: re.sub(r'[^\w\s]', '', x) if isinstance(x, str) else x)
+CATEGORICAL_COLUMNS = ['country', 'food type', 'stars_label', 'ISO Code']
 
-# Clean "address" column: keep text only
-df['address'] = df['address'].apply(lambda x: re.sub(r'[^a-zA-Z\s]', '', x) if isinstance(x, str) else x)
 
-# Add "country" column based on the address (assumes country is the last part of the address)
-df['country'] = df['address'].apply(lambda x: x.split()[-1] if isinstance(x, str) else None)
+def load_jsonl_data(path):
+    """Load the raw JSONL file into a DataFrame without guessing dtypes or dates."""
+    return pd.read_json(path, lines=True, dtype=False, convert_dates=False, precise_float=True)
 
-# Clean "description" column: keep text only
-df['description'] = df['description'].apply(lambda x: re.sub(r'[^a-zA-Z\s]', '', x) if isinstance(x, str) else x)
 
-# Clean "latitude and longitude" column: remove weird symbols
-df['latitude and longitude'] = df['latitude and longitude'].apply(lambda x: re.sub(r'[^\w\s]', '', x) if isinstance(x, str) else x)
+def strip_pattern(series, pattern):
+    """Remove every match of `pattern` from the string values of a column; other values are left as they are."""
+    cleaned = series.str.replace(pattern, '', regex=True)
+    return cleaned.where(cleaned.notna(), series)
 
-# Clean "food type" column: remove weird symbols
-df['food type'] = df['food type'].apply(lambda x: re.sub(r'[^\w\s]', '', x) if isinstance(x, str) else x)
 
-# Add "stars_label" column: extract the first two words to determine the label
-def extract_stars_label(stars):
-    if isinstance(stars, str):
-        if stars.startswith("Three Stars"):
-            return 3
-        elif stars.startswith("Two Stars"):
-            return 2
-        elif stars.startswith("One Star"):
-            return 1
-        elif stars.startswith("Bib"):
-            return 0
-    return None
+def clean_name_column(df):
+    df['name'] = strip_pattern(df['name'], NON_WORD)
+    return df
 
-df['stars_label'] = df['stars'].apply(extract_stars_label)
 
-# Add "price_symbol_count" column: count the number of symbols in the price
-def count_symbols(price):
-    if isinstance(price, str):
-        return len(re.findall(r'[^\w\s]', price))
-    return 
+def clean_text_columns(df):
+    """Keep letters only in address and description, and drop symbols from food type."""
+    df['address'] = strip_pattern(df['address'], NON_LETTER)
+    df['description'] = strip_pattern(df['description'], NON_LETTER)
+    df['food type'] = strip_pattern(df['food type'], NON_WORD)
+    return df
 
-df['price_symbol_count'] = df['price'].apply(count_symbols)
 
-# Drop "price" and "stars" columns
-df = df.drop(columns=['price', 'stars'], errors='ignore')
+def parse_coordinates(df):
+    """
+    Replace the "latitude and longitude" column with float latitude and longitude columns.
+    Restaurants the geocoder did not find ("N/A") and out-of-range values become NaN.
+    """
+    position = df.columns.get_loc('latitude and longitude')
+    parts = df.pop('latitude and longitude').astype('string').str.extract(COORDINATES)
+    latitude, longitude = exact_floats(parts['latitude']), exact_floats(parts['longitude'])
+    valid = latitude.between(-90, 90) & longitude.between(-180, 180)
+    df.insert(position, 'latitude', latitude.where(valid))
+    df.insert(position + 1, 'longitude', longitude.where(valid))
+    return df
 
-# Save intermediate clean_data.csv
-df.to_csv(output_clean_data_path, index=False)
 
-# Step 2: Replace the country column with corrected names and map to ISO codes
-iso_country_codes = pd.read_csv(iso_country_codes_path)
+def exact_floats(strings):
+    """
+    Parse numeric strings to float64, NaN where they are not numbers. pd.to_numeric only validates:
+    its fast parser can be one unit in the last place off, while float() reproduces the geocoder's value exactly.
+    """
+    valid = pd.to_numeric(strings, errors='coerce').notna()
+    return strings.where(valid, 'nan').astype(object).astype('float64')
 
-# Map the "country" column in cleaned_data to the "Country" column in iso_country_codes
-country_to_iso = dict(zip(iso_country_codes['Country'], iso_country_codes['ISO Code']))
 
-# Define a mapping for unmapped countries
-unmapped_countries = {
-    "Mainland": "China",
-    "Kong": "Hong Kong",
-    "Dhabi": "United Arab Emirates",
-    "Dubai": "United Arab Emirates",
-    "Kingdom": "United Kingdom of Great Britain and Northern Ireland",
-    "Korea": "Korea, Republic of",
-    "Macau": "Macao",
-    "Netherlands": "Netherlands, Kingdom of the",
-    "Republic": "Czechia",
-    "Trkiye": "Türkiye",
-    "USA": "United States of America",
-    "Vietnam": "Viet Nam",
-}
+def extract_country_from_address(df):
+    """Assumes the country is the last word of the address."""
+    df['country'] = df['address'].str.split().str[-1]
+    return df
+
+
+def add_stars_label(df):
+    """Map the Michelin distinction to 3, 2, 1 or 0 (Bib Gourmand); anything else is missing."""
+    stars = df['stars'].astype('string')
+    conditions = [stars.str.startswith(prefix).fillna(False).to_numpy(dtype=bool) for prefix, _ in STAR_PREFIXES]
+    labels = pd.Series(np.select(conditions, [label for _, label in STAR_PREFIXES]), index=df.index, dtype='Int64')
+    df['stars_label'] = labels.where(np.logical_or.reduce(conditions))
+    return df
+
+
+def count_price_symbols(df):
+    """Count the currency symbols in the price to approximate the price category."""
+    df['price_symbol_count'] = df['price'].str.count(NON_WORD.pattern).astype('Int64')
+    return df
+
+
+def drop_unnecessary_columns(df):
+    return df.drop(columns=['price', 'stars'], errors='ignore')
+
+
+def fix_encoding_issues(df):
+    """Decode country names that were stored as latin-1 mojibake of UTF-8 text."""
+    df['country'] = df['country'].str.encode('latin1').str.decode('utf-8')
+    return df
+
+
+def map_iso_codes(df, iso_country_codes):
+    """Replace the country column with corrected names and map it to ISO codes."""
+    country_to_iso = dict(zip(iso_country_codes['Country'], iso_country_codes['ISO Code']))
+    df['country'] = df['country'].replace(unmapped_countries)
+    df['ISO Code'] = df['country'].map(country_to_iso)
+    return df
+
+
+def add_unique_id(df, start=0):
+    """Add a unique index as the first column."""
+    df.insert(0, 'UniqueID', np.arange(start, start + len(df)))
+    return df
+
+
+def to_categories(df):
+    """Store the low-cardinality columns as categoricals, which is much smaller than one Python string per row."""
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def clean_frame(df, iso_country_codes, start=0):
+    """Run every cleaning step on a DataFrame of raw restaurants."""
+    df = clean_name_column(df)
+    df = clean_text_columns(df)
+    df = parse_coordinates(df)
+    df = extract_country_from_address(df)
+    df = add_stars_label(df)
+    df = count_price_symbols(df)
+    df = drop_unnecessary_columns(df)
+    df = fix_encoding_issues(df)
+    df = map_iso_codes(df, iso_country_codes)
+    df = add_unique_id(df, start)
+    return to_categories(df)
+
+
+def save_cleaned_data_to_csv(df, path):
+    df.to_csv(path, index=False)
+
+
+def parquet_schema():
+    """Column types of the Parquet output; categoricals become dictionary-encoded strings."""
+    import pyarrow as pa
+
+    text = pa.string()
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("UniqueID", pa.int64()),
+        ("name", text),
+        ("address", text),
+        ("description", text),
+        ("facilities_services", text),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("food type", category),
+        ("country", category),
+        ("stars_label", pa.int64()),
+        ("price_symbol_count", pa.int64()),
+        ("ISO Code", category),
+    ])
+
+
+def to_arrow_table(df, schema):
+    """Convert a cleaned chunk to an Arrow table, writing lists as text the way to_csv does."""
+    import pyarrow as pa
+
+    df = df.copy()
+    df['facilities_services'] = df['facilities_services'].where(df['facilities_services'].isna(), df['facilities_services'].astype(str))
+    df['stars_label'] = df['stars_label'].astype('Int64')
+    for column in ['food type', 'country', 'ISO Code']:
+        df[column] = df[column].astype(object)
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+
+class ChunkWriter:
+    """Appends cleaned chunks to one CSV or Parquet file (chosen by the extension), published atomically on close."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.parquet = path.endswith(".parquet")
+        self.writer = None
+        self.schema = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow.parquet as pq
+
+            if self.writer is None:
+                self.schema = parquet_schema()
+                self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+            self.writer.write_table(to_arrow_table(df, self.schema))
+        else:
+            df.to_csv(self.tmp_path, index=False, mode='w' if self.rows == 0 else 'a', header=self.rows == 0)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+
+def clean_chunk(args):
+    """Worker entry point for the process pool."""
+    chunk, iso_country_codes, start = args
+    return clean_frame(chunk, iso_country_codes, start)
+
+
+def clean_chunked(input_path, output_path, iso_path, chunksize=100_000, workers=1):
+    """
+    Clean the raw JSONL file `chunksize` lines at a time and append each chunk to a single output file,
+    so peak memory depends on the chunk size rather than on the input size.
+    With workers > 1 the chunks are cleaned in a process pool, at most two per worker in flight, in input order.
+    """
+    iso_country_codes = pd.read_csv(iso_path)
+    writer = ChunkWriter(output_path)
+    reader = pd.read_json(input_path, lines=True, dtype=False, convert_dates=False, precise_float=True, chunksize=chunksize)
+
+    start = 0
+    with reader:
+        if workers <= 1:
+            for chunk in reader:
+                writer.write(clean_frame(chunk, iso_country_codes, start))
+                start += len(chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for chunk in reader:
+                    pending.append(pool.submit(clean_chunk, (chunk, iso_country_codes, start)))
+                    start += len(chunk)
+                    if len(pending) >= 2 * workers:
+                        writer.write(pending.pop(0).result())
+                for future in pending:
+                    writer.write(future.result())
+
+    if writer.rows == 0:
+        raise ValueError(f"No restaurants found in {input_path}")
+    writer.close()
+    return writer.rows
 
-# Fix character encoding issues before mapping the country
-def fix_encoding_issues(country):
-    if isinstance(country, str):
-        # Decode improperly encoded text
-        return country.encode('latin1').decode('utf-8')
-    return country
 
-# Apply the fix to the country column
-df['country'] = df['country'].apply(fix_encoding_issues)
+def clean(input_path=input_jsonl_path, output_path=output_clean_data_path, iso_path=iso_country_codes_path,
+          chunksize=None, workers=1):
+    """
+    Clean the raw JSONL file, map countries to ISO codes and write the result to a CSV or, for a `.parquet`
+    output path, a Parquet file. Pass `chunksize` to stream the input instead of loading it whole
+    (see clean_chunked). Returns the number of rows written.
+    """
+    output_folder = os.path.dirname(output_path)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
 
-df['country'] = df['country'].replace(unmapped_countries)
+    if chunksize:
+        return clean_chunked(input_path, output_path, iso_path, chunksize, workers)
 
-# Map the ISO Code using the updated country column
-df['ISO Code'] = df['country'].map(country_to_iso)
+    writer = ChunkWriter(output_path)
+    writer.write(clean_frame(load_jsonl_data(input_path), pd.read_csv(iso_path)))
+    writer.close()
+    return writer.rows
 
-# Add a unique index as the first column
-df.reset_index(inplace=True)
-df.rename(columns={"index": "UniqueID"}, inplace=True)
 
-# Save the final cleaned data with ISO Code
-df.to_csv(output_clean_data_path, index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=input_jsonl_path)
+    parser.add_argument("--output", default=output_clean_data_path, help="a .csv or .parquet path")
+    parser.add_argument("--chunksize", type=int, default=None, help="clean the input this many lines at a time")
+    parser.add_argument("--workers", type=int, default=1, help="processes used to clean chunks")
+    args = parser.parse_args()
 
-print(f"Final cleaned data with ISO codes saved to {output_clean_data_path}")
+    chunksize = args.chunksize
+    if chunksize is None and args.workers > 1:
+        chunksize = 100_000
+    rows = clean(args.input, args.output, chunksize=chunksize, workers=args.workers)
+    print(f"Final cleaned data with ISO codes saved to {args.output} ({rows} rows)")
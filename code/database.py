@@ -1,18 +1,93 @@
 import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
+import threading
+from functools import lru_cache
 
-load_dotenv()
+# Nothing is read or connected at import: .env, SQLAlchemy and the engine are loaded by the first get_engine().
+_engine = None
+_metrics = None
+_lock = threading.Lock()
 
-DATABASE_USERNAME = os.environ["DATABASE_USERNAME"]
-DATABASE_PASSWORD = os.environ["DATABASE_PASSWORD"]
-DATABASE_HOST = os.environ["DATABASE_HOST"]
-DATABASE_PORT = os.environ["DATABASE_PORT"]
-DATABASE_DATABASE = os.environ["DATABASE_DATABASE"]
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_DATABASE}"
+def database_url():
+    return (
+        f"postgresql://{os.environ['DATABASE_USERNAME']}:{os.environ['DATABASE_PASSWORD']}"
+        f"@{os.environ['DATABASE_HOST']}:{os.environ['DATABASE_PORT']}/{os.environ['DATABASE_DATABASE']}"
+    )
+
+
+def pool_settings():
+    """
+    Connection pool: pool_size connections are kept open, up to max_overflow more are opened under load, and a
+    request waits at most pool_timeout seconds for one. Connections are checked with a ping before use and
+    replaced after pool_recycle seconds. Every statement is cancelled after DATABASE_STATEMENT_TIMEOUT_MS (0 = never).
+    """
+    return {
+        "pool_size": int(os.getenv("DATABASE_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DATABASE_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DATABASE_POOL_PRE_PING", "true").lower() not in ("0", "false", "no"),
+        "connect_args": {"options": f"-c statement_timeout={int(os.getenv('DATABASE_STATEMENT_TIMEOUT_MS', 30000))}"},
+    }
+
+
+class PoolMetrics:
+    """Counters of the connection pool's events, next to its current state, for monitoring."""
+
+    def __init__(self, engine, max_overflow):
+        from sqlalchemy import event
+
+        self.engine = engine
+        self.max_overflow = max_overflow
+        self.lock = threading.Lock()
+        self.counts = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+        for name, key in [("connect", "connects"), ("checkout", "checkouts"), ("checkin", "checkins"), ("invalidate", "invalidations")]:
+            event.listen(engine, name, self.counter(key))
+
+    def counter(self, key):
+        def count(*args):
+            with self.lock:
+                self.counts[key] += 1
+        return count
+
+    def stats(self):
+        pool = self.engine.pool
+        with self.lock:
+            counts = dict(self.counts)
+        return {
+            "size": pool.size(), "checked_out": pool.checkedout(), "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(), "max_overflow": self.max_overflow, **counts,
+        }
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
 def get_engine():
-    return engine
\ No newline at end of file
+    """The process-wide pooled engine, created on first use."""
+    global _engine, _metrics
+    with _lock:
+        if _engine is None:
+            from dotenv import load_dotenv
+            from sqlalchemy import create_engine
+
+            load_dotenv()
+            settings = pool_settings()
+            _engine = create_engine(database_url(), **settings)
+            _metrics = PoolMetrics(_engine, settings["max_overflow"])
+        return _engine
+
+
+def pool_stats():
+    """Current size, checked-out and overflow connections of the pool, plus its connect/checkout counters."""
+    get_engine()
+    return _metrics.stats()
+
+
+@lru_cache(maxsize=256)
+def statement(sql, *expanding):
+    """
+    One text() construct per distinct SQL string, so hot queries are not parsed for bind parameters on every
+    call; their compiled form then comes from the engine's statement cache. Parameters named in `expanding`
+    take a list of values, for `IN :name`.
+    """
+    from sqlalchemy import bindparam, text
+
+    return text(sql).bindparams(*(bindparam(name, expanding=True) for name in expanding))
@@ -1,56 +1,107 @@
-import os
+import argparse
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
 
+from artifacts import artifacts_dir, save_embedding_artifacts, to_pgvector
+from encoding import EmbeddingCache, encode_with_cache
+from model_registry import export_onnx, get_model
+from vector_index import INDEX_FILES, QUANTIZED_FILES, QuantizedIndex, sync_index
 
-current_path = Path(__file__).resolve().parent  
-project_root = current_path.parent  
+
+current_path = Path(__file__).resolve().parent
+project_root = current_path.parent
 
 
 csv_path = project_root / "artifacts" / "cleaned_data.csv"
 output_csv_path = project_root / "artifacts" / "cleaned_data_with_embeddings.csv"
 
+MODEL_NAME = "all-MiniLM-L6-v2"
 
-if csv_path.exists():
-    print("File exists. Proceeding to load the CSV.")
-else:
-    print(f"File does not exist at path: {csv_path}")
-    exit()
 
+def load_model(name=MODEL_NAME):
+    model = get_model(name)
+    print("Model loaded successfully.")
+    return model
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-print("Model loaded successfully.")
 
+def load_csv(path=csv_path):
+    if path.exists():
+        print("File exists. Proceeding to load the CSV.")
+    else:
+        print(f"File does not exist at path: {path}")
+        exit()
 
-try:
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(path)
     print("CSV file loaded successfully.")
-except FileNotFoundError:
-    print(f"The specified file does not exist at path: {csv_path}")
-    exit()
-
-
-print(df.head())
-
-
-if 'description' not in df.columns:
-    print("The 'description' column does not exist in the CSV file.")
-    exit()
-
-
-df["embedding"] = None
-
-
-print("Generating embeddings for each description...")
-for index, row in df.iterrows():
-    description = row["description"]
-    if pd.notna(description):
-        embedding = model.encode(description).tolist()
-        df.at[index, "embedding"] = str(embedding)
-
-print("Embeddings generated successfully.")
-
-
-df.to_csv(output_csv_path, index=False)
-print(f"Updated CSV file saved at: {output_csv_path}")
+    print(df.head())
+    return df
+
+
+def validate_column(df, column="description"):
+    if column not in df.columns:
+        print(f"The '{column}' column does not exist in the CSV file.")
+        exit()
+
+
+def generate_embeddings(model, df, batch_size=64, processes=0, cache=None):
+    """
+    Encode every description in batches and return the UniqueIDs that have one and their float32 embedding matrix.
+    Descriptions found in the cache (by model name and hash of the text) are not encoded again.
+    """
+    print("Generating embeddings for each description...")
+    described = df[df["description"].notna()]
+    ids = described["UniqueID"].to_numpy(dtype=np.int64)
+    matrix = encode_with_cache(model, MODEL_NAME, described["description"].tolist(), cache, batch_size, processes)
+    print("Embeddings generated successfully.")
+    return ids, matrix
+
+
+def save_csv(df, ids, embeddings, path=output_csv_path):
+    """Write the embeddings as pgvector text into a CSV file, for importing the table by hand in DBeaver."""
+    df = df.copy()
+    df["embedding"] = pd.Series(to_pgvector(embeddings), index=ids).reindex(df["UniqueID"]).to_numpy()
+    df.to_csv(path, index=False)
+    print(f"Updated CSV file saved at: {path}")
+
+
+def process_csv_with_embeddings(write_csv=False, batch_size=64, processes=0, use_cache=True, ann=(), quantize=(), onnx=False):
+    model = load_model()
+    df = load_csv()
+    validate_column(df)
+    cache = EmbeddingCache() if use_cache else None
+    try:
+        ids, embeddings = generate_embeddings(model, df, batch_size, processes, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    save_embedding_artifacts(df, ids, embeddings)
+    print(f"Embedding artifacts saved in: {artifacts_dir}")
+    # Every persisted index and compressed copy is updated, not only the requested ones, so match.py never opens
+    # stale vectors.
+    for kind, name in INDEX_FILES.items():
+        if kind in ann or (artifacts_dir / name).exists():
+            sync_index(kind, ids, embeddings, artifacts_dir)
+    for storage, name in QUANTIZED_FILES.items():
+        if storage in quantize or (artifacts_dir / name).exists():
+            QuantizedIndex.build(ids, embeddings, storage).save(artifacts_dir / name)
+            print(f"{storage} embeddings saved in: {artifacts_dir / name}")
+    if write_csv:
+        save_csv(df, ids, embeddings)
+    if onnx:
+        export_onnx(MODEL_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", action="store_true", help="also write cleaned_data_with_embeddings.csv")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=0, help="encode with this many CPU worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="encode every description again")
+    parser.add_argument("--ann", action="append", choices=list(INDEX_FILES), default=[], help="build or update an approximate index")
+    parser.add_argument("--quantize", action="append", choices=list(QUANTIZED_FILES), default=[], help="also save a compressed copy of the embeddings")
+    parser.add_argument("--onnx", action="store_true", help="also export the query encoder to ONNX, float32 and int8")
+    args = parser.parse_args()
+
+    process_csv_with_embeddings(args.csv, args.batch_size, args.processes, not args.no_cache, args.ann, args.quantize, args.onnx)
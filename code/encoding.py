@@ -0,0 +1,112 @@
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+
+
+current_path = Path(__file__).resolve().parent
+project_root = current_path.parent
+cache_path = project_root / "data" / "embedding_cache.sqlite"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite store of float32 embeddings keyed by (model name, SHA-256 of the text),
+    so an incremental refresh only encodes descriptions that are new or have changed.
+    """
+
+    def __init__(self, path=cache_path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get_many(self, model_name, hashes):
+        """Return {hash: embedding} for the hashes that are cached."""
+        found = {}
+        hashes = list(hashes)
+        with self.lock:
+            # Stay below SQLite's limit on the number of bound parameters.
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT hash, embedding FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model_name, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name, items):
+        """Store an iterable of (hash, embedding) pairs."""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, embedding) VALUES (?, ?, ?)",
+                [(model_name, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def encode_texts(model, texts, batch_size=64, processes=0):
+    """
+    Encode a list of texts in batches of `batch_size` and return a float32 matrix.
+    With processes > 1 the batches are spread over that many CPU worker processes.
+    """
+    if len(texts) == 0:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if processes > 1:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * processes)
+        try:
+            embeddings = model.encode_multi_process(texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=len(texts) > batch_size)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def encode_with_cache(model, model_name, texts, cache=None, batch_size=64, processes=0):
+    """
+    Return the float32 embeddings of `texts`, one row per text.
+    Identical texts are encoded once, and with a cache only the texts it has not seen are sent to the model.
+    """
+    hashes = [text_hash(text) for text in texts]
+    unique = dict(zip(hashes, texts))
+    known = cache.get_many(model_name, unique) if cache is not None else {}
+
+    missing = [key for key in unique if key not in known]
+    print(f"{len(texts)} texts, {len(unique)} distinct, {len(known)} cached, {len(missing)} to encode.")
+    encoded = encode_texts(model, [unique[key] for key in missing], batch_size, processes)
+    if cache is not None and missing:
+        cache.put_many(model_name, zip(missing, encoded))
+    known.update(zip(missing, encoded))
+
+    dim = model.get_sentence_embedding_dimension()
+    if not hashes:
+        return np.zeros((0, dim), dtype=np.float32)
+    return np.stack([known[key] for key in hashes]).astype(np.float32, copy=False)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Column names of the same fields in the cleaned artifacts and in the database table.
+FRAME_COLUMNS = {"stars": "stars_label", "countries": "country", "iso_codes": "ISO Code", "food_types": "food type"}
+DB_COLUMNS = {"stars": "stars_label", "countries": "country", "iso_codes": "iso_code", "food_types": "food_type"}
+
+
+class Filters:
+    """
+    Structured predicates applied inside a search: any of the given star labels, countries, ISO codes and
+    food types, a price_symbol_count range (inclusive) and `near=(latitude, longitude, radius_km)`.
+    Arguments left as None do not filter.
+    """
+
+    def __init__(self, stars=None, countries=None, iso_codes=None, food_types=None, price_range=None, near=None):
+        self.stars = sorted(int(value) for value in stars) if stars else None
+        self.countries = sorted(countries) if countries else None
+        self.iso_codes = sorted(iso_codes) if iso_codes else None
+        self.food_types = sorted(food_types) if food_types else None
+        self.price_range = tuple(price_range) if price_range else None
+        self.near = tuple(float(value) for value in near) if near else None
+
+    def is_empty(self):
+        return self.key() == (None,) * 6
+
+    def key(self):
+        """Hashable form, for the results caches."""
+        lists = (self.stars, self.countries, self.iso_codes, self.food_types)
+        return tuple(tuple(values) if values else None for values in lists) + (self.price_range, self.near)
+
+    def sql(self):
+        """Return (conditions joined by AND, params) on the cleaned_data_with_embeddings columns, aliased r."""
+        conditions, params = [], {}
+        for name, column in DB_COLUMNS.items():
+            values = getattr(self, name)
+            if values:
+                # A single value is written as `column = :x` so that partial indexes on it can match.
+                if len(values) == 1:
+                    conditions.append(f"r.{column} = :{name}")
+                    params[name] = values[0]
+                else:
+                    conditions.append(f"r.{column} IN ({', '.join(f':{name}_{i}' for i in range(len(values)))})")
+                    params.update({f"{name}_{i}": value for i, value in enumerate(values)})
+        if self.price_range:
+            conditions.append("r.price_symbol_count BETWEEN :min_price AND :max_price")
+            params["min_price"], params["max_price"] = self.price_range
+        if self.near:
+            # ST_DWithin on the geography column is answered from its GiST index (sql/migrations/003).
+            conditions.append(
+                "ST_DWithin(r.location, CAST(ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326) AS geography), :radius_m)"
+            )
+            latitude, longitude, radius_km = self.near
+            params.update({"latitude": latitude, "longitude": longitude, "radius_m": radius_km * 1000})
+        return " AND ".join(conditions) or "TRUE", params
+
+
+def coordinates(frame):
+    """
+    Latitude and longitude as float arrays (NaN where unknown): the numeric columns written by data_cleaning.py,
+    or for artifacts cleaned before those existed, parsed from the "{'lat': .., 'lng': ..}" text column.
+    """
+    if "latitude" in frame and "longitude" in frame:
+        return frame["latitude"].to_numpy(dtype=float), frame["longitude"].to_numpy(dtype=float)
+    parts = frame["latitude and longitude"].astype("string").str.extract(
+        r"'lat':\s*(?P<lat>-?[\d.eE+-]+).*?'lng':\s*(?P<lng>-?[\d.eE+-]+)"
+    )
+    return pd.to_numeric(parts["lat"], errors="coerce").to_numpy(), pd.to_numeric(parts["lng"], errors="coerce").to_numpy()
+
+
+def haversine_km(latitudes, longitudes, latitude, longitude):
+    """Great-circle distance in km from one point to arrays of points, all in degrees."""
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    a = np.sin((latitudes - latitude) / 2) ** 2 + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class Bitmaps:
+    """
+    Boolean row masks of a frame of restaurants, one per value of each filterable column, built on first use
+    and reused; a Filters object becomes one mask by OR-ing within a column and AND-ing across columns.
+    The masks are never modified after they are built, so one Bitmaps can serve several threads.
+    """
+
+    def __init__(self, frame):
+        self.size = len(frame)
+        self.codes = {}
+        for name, column in FRAME_COLUMNS.items():
+            values = frame[column]
+            if name == "stars":
+                values = pd.to_numeric(values, errors="coerce").astype("Int64")
+            self.codes[name] = pd.Categorical(values)
+        self.prices = pd.to_numeric(frame["price_symbol_count"], errors="coerce").to_numpy(dtype=float)
+        self.latitudes, self.longitudes = coordinates(frame)
+        self.masks = {}
+
+    def value_mask(self, name, value):
+        key = (name, value)
+        mask = self.masks.get(key)
+        if mask is None:
+            categorical = self.codes[name]
+            code = categorical.categories.get_indexer([value])[0]
+            mask = categorical.codes == code if code >= 0 else np.zeros(self.size, dtype=bool)
+            mask.setflags(write=False)
+            self.masks[key] = mask
+        return mask
+
+    def mask(self, filters):
+        """Return the rows matching `filters`, or None when nothing is filtered."""
+        if filters is None or filters.is_empty():
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        for name in FRAME_COLUMNS:
+            values = getattr(filters, name)
+            if values:
+                column = np.zeros(self.size, dtype=bool)
+                for value in values:
+                    column |= self.value_mask(name, value)
+                mask &= column
+        if filters.price_range:
+            low, high = filters.price_range
+            mask &= (self.prices >= low) & (self.prices <= high)
+        if filters.near:
+            latitude, longitude, radius_km = filters.near
+            candidates = np.flatnonzero(mask)
+            inside = haversine_km(self.latitudes[candidates], self.longitudes[candidates], latitude, longitude) <= radius_km
+            mask[:] = False
+            mask[candidates[inside]] = True
+        return mask
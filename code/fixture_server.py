@@ -0,0 +1,115 @@
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for guide.michelin.com that serves listing and restaurant pages
+# with the same markup the scrapers look for, so a crawl can run without the network.
+
+LISTING_TEMPLATE = """<html><body><div class="row">{cards}</div></body></html>"""
+
+CARD_TEMPLATE = """
+<div class="card__menu">
+  <h3 class="card__menu-content--title pl-text pl-big js-match-height-title">
+    <a href="{href}">Restaurant {num}</a>
+  </h3>
+</div>"""
+
+RESTAURANT_TEMPLATE = """<html><body>
+<div class="section section-main">
+  <div class="row">
+    <div class="col col-12 col-lg-12"><h1>Restaurant {num}</h1></div>
+    <div class="data-sheet__classification-item--content">MICHELIN Guide</div>
+    <div class="data-sheet__classification-item--content">{stars}</div>
+  </div>
+  <div class="row">
+    <div class="data-sheet__block--text">{num} Main Street, {city}, {country}</div>
+    <div class="data-sheet__block--text">{price} · {food_type}</div>
+    <div class="data-sheet__description">Restaurant {num} serves seasonal {food_type} dishes in a cozy dining room.</div>
+  </div>
+</div>
+<div class="modal modal__common fade">
+  <ul><li>Air conditioning</li><li>Terrace</li><li>Wheelchair access</li></ul>
+</div>
+</body></html>"""
+
+STARS = ["Three Stars: Exceptional cuisine", "Two Stars: Excellent cooking", "One Star: High quality cooking", "Bib Gourmand: good quality, good value cooking"]
+PLACES = [("Paris", "France"), ("Tokyo", "Japan"), ("New York", "USA"), ("Rome", "Italy")]
+FOOD_TYPES = ["French", "Japanese", "Italian", "Vegetarian", "Seafood"]
+
+
+def render_listing(page, pages, per_page):
+    """Returns the HTML of a listing page, which is empty past the last page."""
+    if page < 1 or page > pages:
+        return LISTING_TEMPLATE.format(cards="")
+    first = (page - 1) * per_page
+    cards = "".join(CARD_TEMPLATE.format(href=f"restaurant/{num}", num=num) for num in range(first, first + per_page))
+    return LISTING_TEMPLATE.format(cards=cards)
+
+
+def render_restaurant(num):
+    """Returns the HTML of restaurant page `num`."""
+    city, country = PLACES[num % len(PLACES)]
+    return RESTAURANT_TEMPLATE.format(
+        num=num,
+        city=city,
+        country=country,
+        stars=STARS[num % len(STARS)],
+        price="$" * (num % 4 + 1),
+        food_type=FOOD_TYPES[num % len(FOOD_TYPES)],
+    )
+
+
+def make_handler(pages, per_page):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            listing = re.fullmatch(r"/page/(\d+)", self.path)
+            restaurant = re.fullmatch(r"/+restaurant/(\d+)", self.path)
+            if listing:
+                body = render_listing(int(listing.group(1)), pages, per_page)
+            elif restaurant:
+                body = render_restaurant(int(restaurant.group(1)))
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            etag = '"' + hashlib.md5(data).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(pages=3, per_page=20, port=0):
+    """Starts the stand-in site on a background thread and returns (server, listing_url)."""
+    server = FixtureServer(("127.0.0.1", port), make_handler(pages, per_page))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    listing_url = f"http://127.0.0.1:{server.server_address[1]}/page/"
+    return server, listing_url
+
+
+if __name__ == "__main__":
+    server, listing_url = serve(port=8000)
+    print(f"Serving fixture pages at {listing_url}")
+    threading.Event().wait()
@@ -0,0 +1,194 @@
+import abc
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import dotenv
+
+from common import RateLimiter
+
+NOT_FOUND = "N/A"
+
+
+def normalize_query(name, country):
+    """Returns the cache key of a restaurant: "name, country", case-folded with whitespace collapsed."""
+    query = unicodedata.normalize("NFKC", f"{name}, {country}")
+    return " ".join(query.casefold().split())
+
+
+class Geocoder(abc.ABC):
+    """
+    Turns a restaurant name and country into {"lat": ..., "lng": ...}, or "N/A" when nothing is found.
+    Subclasses implement geocode(); geocode_many() dispatches a batch of lookups concurrently.
+    """
+
+    @abc.abstractmethod
+    def geocode(self, name, country):
+        """Returns the coordinates of one restaurant, or "N/A"."""
+
+    def geocode_many(self, queries, concurrency=8):
+        """Takes a list of (name, country) pairs and returns their coordinates in the same order."""
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda query: self.geocode(*query), queries))
+
+
+class GooglePlacesGeocoder(Geocoder):
+    """
+    Looks restaurants up with the Google Places text search.
+    The client is created on first use, and calls are throttled to `qps` queries per second across threads
+    so a concurrent crawl stays inside the API quota.
+    """
+
+    def __init__(self, api_key=None, qps=10):
+        self.api_key = api_key
+        self.limiter = RateLimiter(qps)
+        self.lock = threading.Lock()
+        self.client = None
+
+    def get_client(self):
+        with self.lock:
+            if self.client is None:
+                import googlemaps
+
+                dotenv.load_dotenv(".env")
+                self.client = googlemaps.Client(self.api_key or os.environ["GOOGLE_PLACE_API_KEY"])
+            return self.client
+
+    def geocode(self, name, country):
+        client = self.get_client()
+        self.limiter.wait()
+        response = client.places(query = f"{name}, {country}")
+        results = response.get("results")
+        if len(results) > 0:
+            return results[0]["geometry"]["location"]
+        return NOT_FOUND
+
+
+class OfflineGeocoder(Geocoder):
+    """
+    A stand-in that never touches the network, for running and testing the crawl offline.
+    Restaurants in `places` (a dict of (name, country) to coordinates) are returned as given;
+    any other query gets stable made-up coordinates derived from its hash, or "N/A" when `invent` is False.
+    """
+
+    def __init__(self, places=None, invent=True):
+        self.places = {normalize_query(*key): value for key, value in (places or {}).items()}
+        self.invent = invent
+
+    def geocode(self, name, country):
+        key = normalize_query(name, country)
+        if key in self.places:
+            return self.places[key]
+        if not self.invent:
+            return NOT_FOUND
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        lat = int.from_bytes(digest[:4], "big") / 2**32 * 180 - 90
+        lng = int.from_bytes(digest[4:8], "big") / 2**32 * 360 - 180
+        return {"lat": round(lat, 7), "lng": round(lng, 7)}
+
+
+class GeocodeCache:
+    """
+    SQLite cache of geocoding results keyed by the normalized "name, country".
+    Hits expire after `ttl` seconds and misses ("N/A") after `negative_ttl` seconds, so restaurants
+    that were not found are retried sooner than coordinates are refreshed.
+    """
+
+    def __init__(self, path, ttl=90 * 24 * 3600, negative_ttl=7 * 24 * 3600):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocodes (
+                query TEXT PRIMARY KEY,
+                lat REAL,
+                lng REAL,
+                cached_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        """Returns the cached coordinates, "N/A" for a cached miss, or None if the key is absent or expired."""
+        with self.lock:
+            row = self.conn.execute("SELECT lat, lng, cached_at FROM geocodes WHERE query = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        lat, lng, cached_at = row
+        found = lat is not None
+        if time.time() - cached_at > (self.ttl if found else self.negative_ttl):
+            return None
+        return {"lat": lat, "lng": lng} if found else NOT_FOUND
+
+    def put(self, key, location):
+        lat, lng = (location["lat"], location["lng"]) if isinstance(location, dict) else (None, None)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO geocodes (query, lat, lng, cached_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lng, time.time()),
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedGeocoder(Geocoder):
+    """
+    Answers from a GeocodeCache and only asks the wrapped geocoder on a miss or an expired entry.
+    geocode_many() calls geocode() from several threads, so the counters are updated under the cache's lock.
+    """
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def geocode(self, name, country):
+        key = normalize_query(name, country)
+        location = self.cache.get(key)
+        with self.cache.lock:
+            if location is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if location is not None:
+            return location
+        location = self.backend.geocode(name, country)
+        self.cache.put(key, location)
+        return location
+
+
+CACHE_DIR = "data"
+default_geocoder = None
+default_lock = threading.Lock()
+
+
+def get_geocoder():
+    """
+    Returns the geocoder used by the scraper, created on first use.
+    GEOCODER=offline selects the offline stand-in; otherwise Google Places is used.
+    Each backend has its own cache file so made-up coordinates never leak into the real ones.
+    """
+    global default_geocoder
+    with default_lock:
+        if default_geocoder is None:
+            dotenv.load_dotenv(".env")
+            name = os.environ.get("GEOCODER", "google")
+            if name == "offline":
+                backend = OfflineGeocoder()
+            else:
+                backend = GooglePlacesGeocoder(qps=float(os.environ.get("GEOCODER_QPS", 10)))
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            cache = GeocodeCache(os.path.join(CACHE_DIR, f"geocode_cache_{name}.sqlite"))
+            default_geocoder = CachedGeocoder(backend, cache)
+        return default_geocoder
@@ -1,32 +1,30 @@
 import pandas as pd
 import geopandas as gpd
-import ast
-from code.database import get_engine
+from code.repository import NearbyRestaurant, RestaurantRepository
+from code.spatial_index import SpatialIndex
 
-def query_data():
-    query = """
-    SELECT name, food_type, address, stars_label, latitude_and_longitude
-    FROM cleaned_data_with_embeddings
-    WHERE latitude_and_longitude IS NOT NULL;
-    """
-    engine = get_engine()
-    with engine.connect() as connection:
-        df = pd.read_sql(query, connection)
+def query_data(repository=None):
+    df = (repository or RestaurantRepository()).map_points()
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.longitude, df.latitude), crs="EPSG:4326")
+    return gdf
 
-    def extract_lat_lng(value):
-        try:
-            value_dict = ast.literal_eval(value)
-            return value_dict.get('lat'), value_dict.get('lng')
-        except (ValueError, SyntaxError, TypeError):
-            return None, None
 
-    df['latitude'], df['longitude'] = zip(*df['latitude_and_longitude'].apply(extract_lat_lng))
-    df = df.dropna(subset=['latitude', 'longitude'])
+def query_nearest(latitude, longitude, num_results=10, radius_km=None, repository=None):
+    """
+    Let Postgres find the `num_results` restaurants nearest to a point (with distance_km), optionally only
+    within `radius_km`, without loading every restaurant into the app.
+    """
+    rows = (repository or RestaurantRepository()).nearest(latitude, longitude, num_results, radius_km)
+    return pd.DataFrame(rows, columns=NearbyRestaurant._fields)
 
-    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.longitude, df.latitude))
-    return gdf
 
-def get_nearest_restaurants(selected_point, gdf, num_results=10):
-    gdf['distance'] = gdf.geometry.apply(lambda x: selected_point.distance(x))
-    nearest_restaurants = gdf.sort_values('distance').head(num_results)
-    return nearest_restaurants
+def get_nearest_restaurants(selected_point, gdf, num_results=10, index=None, radius_km=None):
+    """
+    Return the `num_results` restaurants nearest to a shapely Point (x = longitude, y = latitude), nearest first,
+    with their great-circle `distance_km`. With `radius_km`, return every restaurant within that distance instead.
+    Pass a SpatialIndex built once over `gdf` to avoid rebuilding it on every call; `gdf` itself is not modified.
+    """
+    index = index or SpatialIndex(gdf)
+    if radius_km is not None:
+        return index.within(selected_point.y, selected_point.x, radius_km)
+    return index.nearest(selected_point.y, selected_point.x, num_results)
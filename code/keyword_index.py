@@ -0,0 +1,129 @@
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+KEYWORD_INDEX_NAME = "bm25.npz"
+FIELDS = ["name", "description", "food type", "facilities_services"]
+
+TOKEN = re.compile(r"[^\W_]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or the this to was were with".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased word tokens without common English stop words."""
+    if not isinstance(text, str):
+        return []
+    return [token for token in TOKEN.findall(text.casefold()) if token not in STOP_WORDS]
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over the text of each restaurant. Postings are stored as flat numpy arrays
+    (documents and term frequencies of term t at offsets[t]:offsets[t + 1]), so a query only touches
+    the postings of its own terms. Read-only after construction, so it can be searched from several threads.
+    """
+
+    def __init__(self, ids, vocabulary, offsets, documents, frequencies, lengths, k1=1.2, b=0.75):
+        self.ids = np.asarray(ids)
+        self.vocabulary = np.asarray(vocabulary)
+        self.term_ids = {term: number for number, term in enumerate(self.vocabulary.tolist())}
+        self.offsets = offsets
+        self.documents = documents
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.k1, self.b = k1, b
+        document_frequency = np.diff(offsets)
+        self.idf = np.log(1 + (len(ids) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        self.length_norm = (k1 * (1 - b + b * lengths / max(lengths.mean(), 1))).astype(np.float32)
+
+    @classmethod
+    def build(cls, df, fields=FIELDS, k1=1.2, b=0.75):
+        """Index the text of `fields` for every row of a DataFrame with a UniqueID column."""
+        text = df[fields[0]].fillna("").astype(str)
+        for field in fields[1:]:
+            text = text + " " + df[field].fillna("").astype(str)
+        tokens = pd.Series([tokenize(value) for value in text], index=np.arange(len(df)))
+        lengths = tokens.map(len).to_numpy(dtype=np.float32)
+
+        pairs = tokens.explode().dropna()
+        counts = pairs.groupby([pairs.to_numpy(), pairs.index]).size()
+        terms = counts.index.get_level_values(0)
+        vocabulary, term_numbers = np.unique(np.asarray(terms, dtype=str), return_inverse=True)
+        offsets = np.searchsorted(term_numbers, np.arange(len(vocabulary) + 1))
+        return cls(
+            df["UniqueID"].to_numpy(), vocabulary, offsets,
+            counts.index.get_level_values(1).to_numpy(dtype=np.int32), counts.to_numpy(dtype=np.float32),
+            lengths, k1, b,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, query):
+        """BM25 score of every document for a query string."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            number = self.term_ids.get(term)
+            if number is None:
+                continue
+            start, end = self.offsets[number], self.offsets[number + 1]
+            documents, frequencies = self.documents[start:end], self.frequencies[start:end]
+            scores[documents] += self.idf[number] * frequencies * (self.k1 + 1) / (frequencies + self.length_norm[documents])
+        return scores
+
+    def search(self, query, k=100, mask=None):
+        """
+        Return (positions, scores) of the k best matching documents with a positive score, best first.
+        A boolean `mask` over the documents restricts the search to the documents it selects.
+        """
+        scores = self.scores(query)
+        matched = np.flatnonzero((scores > 0) if mask is None else (scores > 0) & mask)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return matched, scores[matched]
+
+    def nbytes(self):
+        arrays = [self.ids, self.offsets, self.documents, self.frequencies, self.lengths, self.idf, self.length_norm]
+        return sum(array.nbytes for array in arrays) + sum(len(term) for term in self.term_ids)
+
+    def save(self, path):
+        np.savez(
+            path, ids=self.ids, vocabulary=self.vocabulary, offsets=self.offsets, documents=self.documents,
+            frequencies=self.frequencies, lengths=self.lengths, k1=self.k1, b=self.b,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["ids"], data["vocabulary"], data["offsets"], data["documents"], data["frequencies"],
+                data["lengths"], float(data["k1"]), float(data["b"]),
+            )
+
+
+def open_keyword_index(parquet_path, index_path):
+    """Load the persisted index, rebuilding it first if the cleaned Parquet artifact is newer."""
+    parquet_path, index_path = Path(parquet_path), Path(index_path)
+    if index_path.exists() and index_path.stat().st_mtime >= parquet_path.stat().st_mtime:
+        return KeywordIndex.load(index_path)
+    index = KeywordIndex.build(pd.read_parquet(parquet_path, columns=["UniqueID", *FIELDS]))
+    index.save(index_path)
+    print(f"Keyword index built over {len(index)} restaurants.")
+    return index
+
+
+def reciprocal_rank_fusion(*rankings, k=60, limit=20):
+    """
+    Fuse ranked lists of ids: each id scores sum(1 / (k + rank)) over the lists it appears in (rank from 1).
+    Return the `limit` best (id, score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
@@ -0,0 +1,143 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    result TEXT,
+    run_id INTEGER,
+    status TEXT,
+    fetched_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS pages_run_idx ON pages (run_id);
+"""
+
+
+class FetchLedger:
+    """
+    Persistent record of every restaurant page fetched, keyed by URL.
+    Each entry keeps the ETag, Last-Modified and content hash of the page together with the parsed restaurant,
+    the run that last saw it and whether that run found it new, changed or unchanged.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def start_run(self, resume=True):
+        """Returns the id of the unfinished run to resume, or of a new run."""
+        with self.lock:
+            if resume:
+                row = self.conn.execute(
+                    "SELECT run_id FROM runs WHERE finished_at IS NULL ORDER BY run_id DESC LIMIT 1"
+                ).fetchone()
+                if row:
+                    return row["run_id"]
+            cursor = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        """Closes a run that has visited every listing page, marking the pages it did not see as removed."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE pages SET run_id = ?, status = 'removed' WHERE run_id != ? AND status != 'removed'",
+                (run_id, run_id),
+            )
+            self.conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+            self.conn.commit()
+
+    def last_run(self):
+        """Returns the most recent run as a dictionary with run_id, started_at and finished_at."""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def get(self, url):
+        """Returns the ledger entry of a url as a dictionary, or None if it has never been fetched."""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["result"] = json.loads(entry["result"]) if entry["result"] else None
+        return entry
+
+    def record(self, url, run_id, result, etag=None, last_modified=None, content_hash=None, status="new"):
+        """Stores a freshly parsed page."""
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO pages (url, etag, last_modified, content_hash, result, run_id, status, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    result = excluded.result,
+                    run_id = excluded.run_id,
+                    status = excluded.status,
+                    fetched_at = excluded.fetched_at
+                """,
+                (url, etag, last_modified, content_hash, json.dumps(result), run_id, status, time.time()),
+            )
+            self.conn.commit()
+
+    def mark_unchanged(self, url, run_id):
+        """Marks a page as seen by this run without touching its stored result."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE pages SET run_id = ?, status = 'unchanged', fetched_at = ? WHERE url = ?",
+                (run_id, time.time(), url),
+            )
+            self.conn.commit()
+
+    def results(self, run_id):
+        """Returns every restaurant seen by a run."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT result FROM pages WHERE run_id = ? AND status != 'removed' ORDER BY url", (run_id,)
+            ).fetchall()
+        return [json.loads(row["result"]) for row in rows]
+
+    def delta(self, run_id):
+        """Returns the restaurants a finished run found new or changed, and those it no longer found."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT result, status FROM pages WHERE run_id = ? AND status != 'unchanged' ORDER BY url", (run_id,)
+            ).fetchall()
+        delta = {"new": [], "changed": [], "removed": []}
+        for row in rows:
+            delta[row["status"]].append(json.loads(row["result"]))
+        return delta
+
+    def close(self):
+        self.conn.close()
+
+
+def conditional_headers(entry):
+    """Returns the If-None-Match / If-Modified-Since headers for a ledger entry."""
+    headers = {}
+    if entry and entry["status"] != "removed":
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
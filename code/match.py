@@ -1,74 +1,61 @@
 import os
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from pathlib import Path
 
+from artifacts import artifacts_dir, PARQUET_NAME, load_embedding_matrix, load_restaurants
+from filters import Bitmaps
+from keyword_index import KEYWORD_INDEX_NAME, open_keyword_index, reciprocal_rank_fusion
+from model_registry import MODEL_NAME, TTLCache, get_query_encoder, normalize_query, warm_up_in_background
+from vector_index import open_index
 
-current_path = Path(__file__).resolve().parent
-project_root = current_path.parent  
 
+parquet_path = artifacts_dir / PARQUET_NAME
 
-csv_path = project_root / "artifacts" / "cleaned_data_with_embeddings.csv"
 
+print(f"Resolved artifacts path: {parquet_path}")
 
-print(f"Resolved CSV path: {csv_path}")
 
-
-if not csv_path.exists():
-    print(f"Error: The file at path '{csv_path}' does not exist.")
+if not parquet_path.exists():
+    print(f"Error: The file at path '{parquet_path}' does not exist. Run code/embedding.py first.")
     exit()
 
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
+# The model loads in the background while the artifacts below are read; the first query waits for it if needed.
+warm_up_in_background(MODEL_NAME)
+results_cache = TTLCache()
 
-try:
-    df = pd.read_csv(csv_path)
-    print("CSV file loaded successfully.")
-except FileNotFoundError:
-    print(f"Error: The file at path '{csv_path}' does not exist.")
-    exit()
 
+# The embeddings are memory-mapped from embeddings.npy and searched exactly, in the compressed form named by
+# MATCH_STORAGE (float16, int8 or binary), or through the approximate index named by MATCH_INDEX (ivf or hnsw).
+# The restaurants are read from Parquet and put in the order of the index rows.
+ids, embeddings = load_embedding_matrix()
+index = open_index(ids, embeddings, artifacts_dir)
+restaurants = load_restaurants().set_index("UniqueID", drop=False)
+df = restaurants.loc[index.ids].reset_index(drop=True)
+keywords = open_keyword_index(parquet_path, artifacts_dir / KEYWORD_INDEX_NAME)
+# Filters are evaluated once over all restaurants and then mapped to the rows of each index.
+bitmaps = Bitmaps(restaurants)
+index_rows = restaurants.index.get_indexer(index.ids)
+keyword_rows = restaurants.index.get_indexer(keywords.ids)
+print("Embedding artifacts loaded successfully.")
 
-df['embedding'] = df['embedding'].apply(eval)
-
-def match(user_query):
-    """
-    Generate an embedding for the user's input and calculate its similarity to each restaurant's description embedding.
-    Return the 20 most similar, unique restaurants.
-    """
-    
-    user_embedding = model.encode([user_query])[0]
-
-    
-    user_embedding_np = np.array(user_embedding).reshape(1, -1)
-
-    
-    embeddings = np.array(df['embedding'].tolist()) 
-    
-    
-    similarities = cosine_similarity(user_embedding_np, embeddings)[0]
-
-    
-    df['similarity'] = similarities
-
-    
-    print(df[['name', 'similarity']].sort_values(by='similarity', ascending=False))
 
-    
-    df_filtered = df[df['similarity'] > 0.5].sort_values(by='similarity', ascending=False)
+def filter_masks(filters):
+    """Return the rows of the vector index and of the keyword index that pass `filters`, or None for each without filters."""
+    mask = bitmaps.mask(filters)
+    if mask is None:
+        return None, None
+    return mask[index_rows], mask[keyword_rows]
 
-    
-    top_100 = df_filtered.head(100)
 
-    
-    unique_restaurants = top_100.drop_duplicates(subset='name').head(20)
+def results_from_hits(positions, scores):
+    """Turn index hits into result dictionaries, keeping the best-scoring restaurant of each name, at most 20."""
+    hits = df.iloc[positions][["UniqueID", "name", "address", "country", "stars_label", "ISO Code"]].copy()
+    hits["similarity"] = scores
+    unique_restaurants = hits.drop_duplicates(subset='name').head(20)
 
-    
     data_list = []
-    for _, row in unique_restaurants.iterrows():
+    for row in unique_restaurants.to_dict("records"):
         data = {
             "UniqueID": row.get("UniqueID", "N/A"),
             "name": row.get("name", "N/A"),
@@ -76,17 +63,80 @@ def match(user_query):
             "country": row.get("country", "N/A"),
             "stars_label": row.get("stars_label", "N/A"),
             "ISO Code": row.get("ISO Code", "N/A"),
-            "similarity": row.get("similarity", 0.0)
+            "similarity": float(row.get("similarity", 0.0))
         }
         data_list.append(data)
+    return data_list
 
 
+def match(user_query, filters=None):
+    """
+    Generate an embedding for the user's input and look up the most similar restaurant descriptions in the index.
+    Return the 20 most similar, unique restaurants with a similarity above 0.5.
+    With `filters` (a filters.Filters) only the restaurants passing them are searched.
+    Recent queries are answered from the results cache.
+    """
+    key = (normalize_query(user_query), filters.key() if filters else None)
+    data_list = results_cache.get(key)
+    if data_list is None:
+        user_embedding = get_query_encoder(MODEL_NAME).encode(user_query)
+        mask, _ = filter_masks(filters)
+        # The 100 best rows above the threshold are enough to find 20 distinct names, as before.
+        positions, scores = index.search(user_embedding, k=100, threshold=0.5, mask=mask)
+        data_list = results_from_hits(positions, scores)
+        results_cache.put(key, data_list)
+    data_list = [dict(data) for data in data_list]
+
     if len(data_list) == 0:
         raise Exception("Did not find any results.")
     
     return data_list
 
 
+def match_hybrid(user_query, candidates=100, filters=None):
+    """
+    Fuse the `candidates` best restaurants by embedding (similarity above 0.5) with the `candidates` best BM25
+    keyword matches by reciprocal rank fusion, and return the 20 best unique restaurants with their fused `score`.
+    Both searches only consider the restaurants passing `filters`.
+    """
+    key = ("hybrid", normalize_query(user_query), filters.key() if filters else None)
+    data_list = results_cache.get(key)
+    if data_list is None:
+        user_embedding = get_query_encoder(MODEL_NAME).encode(user_query)
+        mask, keyword_mask = filter_masks(filters)
+        positions, _ = index.search(user_embedding, k=candidates, threshold=0.5, mask=mask)
+        keyword_positions, _ = keywords.search(user_query, candidates, mask=keyword_mask)
+        fused = reciprocal_rank_fusion(index.ids[positions].tolist(), keywords.ids[keyword_positions].tolist(), limit=candidates)
+
+        fused_ids = [key for key, _ in fused]
+        hits = restaurants.loc[fused_ids, ["UniqueID", "name", "address", "country", "stars_label", "ISO Code"]].copy()
+        hits["score"] = [score for _, score in fused]
+        # Keyword-only matches get their similarity from the embedding matrix; 0.0 if they have no description.
+        rows = pd.Series(np.arange(len(ids)), index=ids).reindex(fused_ids).to_numpy()
+        similarity = np.zeros(len(fused_ids), dtype=np.float32)
+        has_vector = ~np.isnan(rows)
+        vectors = np.asarray(embeddings[rows[has_vector].astype(np.int64)], dtype=np.float32)
+        similarity[has_vector] = vectors @ user_embedding / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(user_embedding) + 1e-12)
+        hits["similarity"] = similarity
+        data_list = [
+            {**data, "similarity": float(data["similarity"])}
+            for data in hits.drop_duplicates(subset="name").head(20).to_dict("records")
+        ]
+        results_cache.put(key, data_list)
+
+    if len(data_list) == 0:
+        raise Exception("Did not find any results.")
+    return [dict(data) for data in data_list]
+
+
+def match_many(user_queries, filters=None):
+    """Run match() for several queries, encoding them together and searching the index with one matrix product."""
+    user_embeddings = get_query_encoder(MODEL_NAME).encode_many(list(user_queries))
+    mask, _ = filter_masks(filters)
+    hits = index.search_batch(user_embeddings, k=100, threshold=0.5, mask=mask)
+    return [results_from_hits(positions, scores) for positions, scores in hits]
+
+
 if __name__ == "__main__":
     user_query = "A cozy place with great vegetarian food"
     try:
@@ -1,69 +1,282 @@
+import argparse
+import os
+import sys
+import numpy as np
 import pandas as pd
-from sqlalchemy import text
-from sentence_transformers import SentenceTransformer
-from code.database import get_engine
+from sqlalchemy.exc import DBAPIError
+from code.database import get_engine, statement
+from code.artifacts import DB_COLUMNS, artifacts_dir, load_embedding_matrix, to_pgvector
+from code.encoding import EmbeddingCache, encode_with_cache
+from code.filters import Filters
+from code.keyword_index import reciprocal_rank_fusion
+from code.bulk_load import bulk_upsert, print_stats, restaurant_rows
+from code.migrations import apply_migrations
+from code.model_registry import TTLCache, get_model, get_query_encoder, normalize_query
+from code.vector_index import sync_indexes
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Name prefixes of the indexes created by sql/migrations (HNSW, partial HNSW per star level, or IVFFlat).
+VECTOR_INDEXES = ("embedding_hnsw", "embedding_ivfflat", "embedding_halfvec_hnsw", "embedding_binary_hnsw")
+
+# Ordering by the distance operator itself, with a LIMIT and no WHERE on the similarity, is the shape
+# pgvector can answer from an HNSW/IVFFlat index; the similarity threshold is applied to the rows returned.
+# {conditions} holds the filter predicates (Filters.sql()), TRUE without filters.
+MATCH_QUERY = """
+    SELECT r.uniqueid, r.name, r.address, r.country, r.stars_label, r.iso_code,
+           1 - (r.embedding <=> CAST(:user_embedding AS vector)) AS similarity
+    FROM cleaned_data_with_embeddings r
+    WHERE {conditions}
+    ORDER BY r.embedding <=> CAST(:user_embedding AS vector)
+    LIMIT :limit
+"""
+
+# Compressed search for RestaurantMatcher(storage="halfvec" or "binary"): the HNSW index of sql/migrations/005
+# over the half-precision or binary_quantize() expression picks :candidates rows, reranked by the full vector.
+QUANTIZED_ORDER = {
+    "halfvec": "r.embedding::halfvec(384) <=> CAST(:user_embedding AS halfvec(384))",
+    "binary": "binary_quantize(r.embedding)::bit(384) <~> binary_quantize(CAST(:user_embedding AS vector))",
+}
+RESCORED_MATCH_QUERY = """
+    SELECT * FROM (
+        SELECT r.uniqueid, r.name, r.address, r.country, r.stars_label, r.iso_code,
+               1 - (r.embedding <=> CAST(:user_embedding AS vector)) AS similarity
+        FROM cleaned_data_with_embeddings r
+        WHERE {conditions}
+        ORDER BY {order}
+        LIMIT :candidates
+    ) AS candidates
+    ORDER BY similarity DESC
+    LIMIT :limit
+"""
+
+# Best full-text matches that pass the filters, with their similarity to the query, from the GIN-indexed
+# search_text column of sql/migrations/006. Any query word may match, as in BM25; rows matching more (and
+# rarer) words rank first.
+KEYWORD_QUERY = """
+    SELECT r.uniqueid, r.name, r.address, r.country, r.stars_label, r.iso_code,
+           1 - (r.embedding <=> CAST(:user_embedding AS vector)) AS similarity
+    FROM cleaned_data_with_embeddings r,
+         CAST(replace(CAST(plainto_tsquery('english', :user_query) AS text), '&', '|') AS tsquery) AS query
+    WHERE r.search_text @@ query AND {conditions}
+    ORDER BY ts_rank_cd(r.search_text, query) DESC
+    LIMIT :candidates
+"""
+
+
+def result_row(row):
+    return {
+        "uniqueid": row[0],
+        "name": row[1],
+        "address": row[2],
+        "country": row[3],
+        "stars_label": row[4],
+        "iso_code": row[5],
+        "similarity": row[6],
+    }
+
+
+def tune_session(conn, ef_search, probes, iterative_scan=None):
+    """
+    Set the index search breadth for the current transaction only. `iterative_scan` ("relaxed_order" or
+    "strict_order", pgvector 0.8.0 or later) lets a filtered index scan continue until it has found LIMIT rows.
+    """
+    settings = "set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"
+    params = {"ef_search": str(ef_search), "probes": str(probes)}
+    if iterative_scan:
+        settings += ", set_config('hnsw.iterative_scan', :iterative_scan, true), set_config('ivfflat.iterative_scan', :iterative_scan, true)"
+        params["iterative_scan"] = iterative_scan
+    conn.execute(statement("SELECT " + settings), params)
+
+
+def explain_match_query(engine, user_embedding=None, limit=20, ef_search=40, probes=10, filters=None):
+    """Return the EXPLAIN output of the match query, by default for a random unit vector."""
+    if user_embedding is None:
+        user_embedding = np.random.default_rng(0).normal(size=384)
+        user_embedding /= np.linalg.norm(user_embedding)
+    conditions, params = filters.sql() if filters else ("TRUE", {})
+    with engine.begin() as conn:
+        tune_session(conn, max(ef_search, limit), probes)
+        rows = conn.execute(
+            statement("EXPLAIN " + MATCH_QUERY.format(conditions=conditions)),
+            {"user_embedding": to_pgvector([user_embedding])[0], "limit": limit, **params},
+        )
+        return "\n".join(row[0] for row in rows)
+
+
+def check_vector_index(engine, filters=None):
+    """Print the plan of the match query and return whether it scans one of the vector indexes."""
+    plan = explain_match_query(engine, filters=filters)
+    print(plan)
+    return any(name in plan for name in VECTOR_INDEXES)
+
 
 class RestaurantMatcher:
-    def __init__(self):
+    def __init__(self, ef_search=None, probes=None, storage=None):
         
         self.engine = get_engine()
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.results = TTLCache()
+        self.ef_search = ef_search or int(os.getenv("HNSW_EF_SEARCH", 40))
+        self.probes = probes or int(os.getenv("IVFFLAT_PROBES", 10))
+        # Filtered queries drop the candidates that fail the filters, so they search wider.
+        self.filtered_ef_search = int(os.getenv("HNSW_FILTERED_EF_SEARCH", 200))
+        self.filtered_probes = int(os.getenv("IVFFLAT_FILTERED_PROBES", 40))
+        self.iterative_scan = os.getenv("HNSW_ITERATIVE_SCAN")
+        # "vector" searches the full-precision index; "halfvec" or "binary" the compressed one, reranking
+        # `oversample` times the limit by the full vectors.
+        self.storage = storage or os.getenv("PG_VECTOR_STORAGE", "vector")
+        if self.storage not in ("vector", *QUANTIZED_ORDER):
+            raise ValueError(f"storage must be vector, halfvec or binary, not {self.storage}")
+        self.oversample = int(os.getenv("PG_RESCORE_OVERSAMPLE", 4))
+
+    @property
+    def encoder(self):
+        """
+        The query encoder, loaded and warmed once per process and shared by every matcher. It is loaded by the
+        first query (or by model_registry.warm_up_in_background) rather than when the matcher is created.
+        """
+        return get_query_encoder(MODEL_NAME)
+
+    @property
+    def model(self):
+        """The SentenceTransformer that encodes restaurant descriptions, whatever the query encoder's backend."""
+        return get_model(MODEL_NAME)
 
-    def match(self, user_query):
+    def match(self, user_query, limit=20, threshold=0.5, hybrid=False, filters=None):
         """
         Calculate the application vector of the user's input, then use pgvector to query the database for similar application vectors, returning the top 20 most similar restaurants.
+        The nearest `limit` rows come from the vector index; those with a similarity at or below `threshold` are dropped afterwards.
+        With hybrid=True the vector ranking is fused with BM25 keyword matches (see hybrid_search).
+        `filters` (a code.filters.Filters) are part of the query itself, so a filtered search still returns the full top `limit`.
+        Recent queries are answered from the results cache without touching the encoder or the database.
         """
-        user_embedding = self.model.encode([user_query])[0]
-        user_embedding_list = user_embedding.tolist()  
-        user_embedding_string = str(user_embedding_list)
-
-        query = """
-            SELECT DISTINCT r.uniqueid, r.name, r.address, r.country, r.stars_label, r.iso_code,
-                   1 - (r.embedding <=> :user_embedding_string) AS similarity
-            FROM cleaned_data_with_embeddings r
-            WHERE (1 - (r.embedding <=> :user_embedding_string)) > 0.5
-            ORDER BY similarity DESC
-            LIMIT 20
+        key = (normalize_query(user_query), limit, threshold, hybrid, filters.key() if filters else None)
+        data_list = self.results.get(key)
+        if data_list is None:
+            search = self.hybrid_search if hybrid else self.query_database
+            data_list = search(user_query, limit, threshold, filters=filters)
+            self.results.put(key, data_list)
+
+        if len(data_list) == 0:
+            raise Exception("Did not find any results.")
+        return [dict(data) for data in data_list]
+
+    def query_database(self, user_query, limit=20, threshold=0.5, filters=None):
+        """Encode the query (through the embedding cache) and return the matching rows from the database as dicts."""
+        user_embedding_string = to_pgvector([self.encoder.encode(user_query)])[0]
+        return self.nearest_rows(user_embedding_string, limit, threshold, filters)
+
+    def nearest_rows(self, user_embedding_string, limit, threshold, filters=None):
+        filtered = filters is not None and not filters.is_empty()
+        conditions, params = filters.sql() if filtered else ("TRUE", {})
+        params.update({"user_embedding": user_embedding_string, "limit": limit})
+        query = MATCH_QUERY.format(conditions=conditions)
+        if self.storage != "vector":
+            params["candidates"] = limit * self.oversample
+            query = RESCORED_MATCH_QUERY.format(conditions=conditions, order=QUANTIZED_ORDER[self.storage])
+        with self.engine.begin() as conn:
+            # hnsw.ef_search caps how many rows the index scan returns, so it must be at least the limit.
+            scanned = params.get("candidates", limit)
+            if filtered:
+                tune_session(conn, max(self.filtered_ef_search, scanned), self.filtered_probes, self.iterative_scan)
+            else:
+                tune_session(conn, max(self.ef_search, scanned), self.probes)
+            rows = conn.execute(statement(query), params).fetchall()
+        return [result_row(row) for row in rows if row[6] > threshold]
+
+    def keyword_rows(self, user_query, user_embedding_string, candidates, filters=None):
         """
+        The `candidates` best full-text matches of the query in the table, best first, or an empty list when
+        the search_text column is missing (sql/migrations/006 not applied yet).
+        """
+        conditions, params = filters.sql() if filters else ("TRUE", {})
+        params.update({"user_query": user_query, "user_embedding": user_embedding_string, "candidates": candidates})
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(statement(KEYWORD_QUERY.format(conditions=conditions)), params).fetchall()
+        except DBAPIError as error:
+            print(f"Keyword search unavailable, using the vector ranking only: {error.orig}")
+            return []
+        return [result_row(row) for row in rows]
 
-        with self.engine.connect() as conn:
-            stmt = text(query)
-            result = conn.execute(stmt, {"user_embedding_string": user_embedding_string})
+    def hybrid_search(self, user_query, limit=20, threshold=0.5, candidates=100, filters=None):
+        """
+        Fuse the `candidates` nearest restaurants by embedding (similarity above `threshold`) with the
+        `candidates` best full-text matches on name, description, food type and facilities, by reciprocal rank
+        fusion. Each result carries its fused `score`. Both rankings are read from the table with the same
+        filters, so they always cover the same rows.
+        """
+        user_embedding_string = to_pgvector([self.encoder.encode(user_query)])[0]
+        by_vector = self.nearest_rows(user_embedding_string, candidates, threshold, filters)
+        by_keyword = self.keyword_rows(user_query, user_embedding_string, candidates, filters)
 
-        if result.rowcount == 0:
-            raise Exception("Did not find any results.")
-        else:
-            rows = result.fetchall()
-            data_list = []
-            for row in rows:
-                data = {
-                    "uniqueid": row[0],
-                    "name": row[1],
-                    "address": row[2],
-                    "country": row[3],
-                    "stars_label": row[4],
-                    "iso_code": row[5],
-                    "similarity": row[6],
-                }
-                data_list.append(data)
-
-        return data_list
-
-    def update_embeddings(self, csv_path):
+        found = {data["uniqueid"]: data for data in by_keyword}
+        found.update({data["uniqueid"]: data for data in by_vector})
+        fused = reciprocal_rank_fusion(
+            [data["uniqueid"] for data in by_vector], [data["uniqueid"] for data in by_keyword], limit=limit
+        )
+        return [dict(found[key], score=score) for key, score in fused]
+
+    def update_embeddings(self, path=artifacts_dir, batch_size=64):
         """
-        Updates the database table with new embeddings calculated from the descriptions in the provided CSV file.
+        Updates the database table with the embeddings from the artifacts folder written by code/embedding.py
+        (Parquet plus embeddings.npy), or, given a CSV file, with embeddings calculated from its descriptions.
+        Descriptions are encoded in batches, and only those missing from the embedding cache are encoded.
+        Approximate indexes persisted in the artifacts folder get the new and changed rows inserted.
+        The rows are loaded with COPY and upserted by uniqueid in one transaction (code/bulk_load.py).
         """
-        df = pd.read_csv(csv_path)
-        df['embedding'] = df['description'].apply(lambda x: self.model.encode(x).tolist()) 
-        df.to_sql('cleaned_data_with_embeddings', con=self.engine, if_exists='replace', index=False)
+        path = str(path)
+        if path.endswith(".csv"):
+            df = pd.read_csv(path)
+            described = df['description'].notna()
+            with EmbeddingCache() as cache:
+                embeddings = encode_with_cache(
+                    self.model, MODEL_NAME, df.loc[described, 'description'].tolist(), cache, batch_size
+                )
+            df['embedding'] = None
+            df.loc[described, 'embedding'] = to_pgvector(embeddings)
+            sync_indexes(df.loc[described, 'UniqueID'].to_numpy(), embeddings, artifacts_dir)
+            df = df.rename(columns=DB_COLUMNS)
+        else:
+            df = restaurant_rows(path)
+            sync_indexes(*load_embedding_matrix(path), path)
+        # The table is upserted in place, so it keeps its types, indexes and views; the migrations then
+        # refresh the country statistics and the planner statistics.
+        print_stats(bulk_upsert(df, self.engine))
+        apply_migrations(self.engine)
+        self.results.clear()
 
-    def run_match_query(self, user_query):
+    def cache_stats(self):
+        """Hit/miss counters of the query embedding cache and of the results cache, and the encoder's batch sizes."""
+        stats = {"embeddings": self.encoder.cache.stats(), "results": self.results.stats()}
+        if self.encoder.batcher is not None:
+            stats["batches"] = self.encoder.batcher.stats()
+        return stats
+
+    def run_match_query(self, user_query, filters=None):
         """
         Runs the match method and prints the results.
         """
         try:
-            results = self.match(user_query)
+            results = self.match(user_query, filters=filters)
             for result in results:
                 print(result)
         except Exception as e:
-            print(e)
\ No newline at end of file
+            print(e)
+
+
+if __name__ == "__main__":
+    # Usage: python3 -m code.match_sql [--explain] [--stars N] ["query"]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query", nargs="?", default="A cozy place with great vegetarian food")
+    parser.add_argument("--explain", action="store_true", help="fail unless the match query uses the vector index")
+    parser.add_argument("--stars", type=int, action="append", help="only restaurants with this stars_label")
+    args = parser.parse_args()
+    filters = Filters(stars=args.stars) if args.stars else None
+
+    if args.explain:
+        if not check_vector_index(get_engine(), filters):
+            print("The match query does not use the vector index; run python3 -m code.migrations.")
+            sys.exit(1)
+    else:
+        RestaurantMatcher().run_match_query(args.query, filters)
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from code.database import get_engine
+
+
+current_path = Path(__file__).resolve().parent
+project_root = current_path.parent
+migrations_dir = project_root / "sql" / "migrations"
+
+
+def migration_files(folder=migrations_dir):
+    return sorted(Path(folder).glob("*.sql"))
+
+
+def apply_migrations(engine=None, folder=migrations_dir):
+    """
+    Run every migration in sql/migrations in order, in one transaction. The migrations are idempotent,
+    so this is also how indexes are restored after the table has been replaced. Their ALTER TABLE statements
+    only run when the catalog shows the change is missing, so applying them after a load does not block readers.
+    """
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        # Index builds can outlast the statement timeout meant for the app's queries.
+        conn.exec_driver_sql("SET LOCAL statement_timeout = 0")
+        # Sent as-is: without bind parameters psycopg2 would still read the files' % signs as placeholders.
+        script = conn.execution_options(no_parameters=True)
+        for path in migration_files(folder):
+            print(f"Applying {path.name}")
+            script.exec_driver_sql(path.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    # Usage: python3 -m code.migrations
+    apply_migrations()
@@ -0,0 +1,345 @@
+import json
+import os
+import re
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Query encoder backends, chosen with QUERY_ENCODER_BACKEND: the SentenceTransformer on PyTorch, or the same
+# transformer exported to ONNX (float32, or with int8 weights) run by onnxruntime. Corpus embeddings are always
+# computed with PyTorch.
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+ENCODER_BACKENDS = ["torch", *ONNX_FILES]
+ONNX_INPUTS = ["input_ids", "attention_mask", "token_type_ids"]
+ONNX_CONFIG = "encoder.json"
+onnx_root = Path(os.getenv("ONNX_MODEL_DIR", Path(__file__).resolve().parent.parent / "artifacts" / "onnx"))
+
+# Bounds of the query caches; override with QUERY_CACHE_SIZE (entries) and QUERY_CACHE_TTL (seconds).
+CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 3600))
+
+# Queries that miss the cache are encoded together: up to QUERY_BATCH_SIZE of them, collected for at most
+# QUERY_BATCH_WAIT_MS after the first one. QUERY_BATCH_SIZE=0 encodes each query on the caller's thread.
+BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", 32))
+BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", 2))
+
+_models = {}
+_encoders = {}
+# Reentrant, so get_query_encoder can hold it while get_model loads: a query that arrives during the
+# background warm-up waits for that model instead of loading a second one.
+_lock = threading.RLock()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a time-to-live: holds at most `maxsize` entries, evicting the least recently
+    used, and treats entries older than `ttl` seconds as missing. Counts hits and misses.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def query_backend():
+    backend = os.getenv("QUERY_ENCODER_BACKEND", "torch")
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"QUERY_ENCODER_BACKEND must be one of {', '.join(ENCODER_BACKENDS)}, not {backend!r}")
+    return backend
+
+
+def get_model(name=MODEL_NAME, backend="torch"):
+    """
+    Return the process-wide model for `name` on `backend`, loading it on first use: the SentenceTransformer for
+    "torch", otherwise an OnnxEncoder, exported from the SentenceTransformer first if its files are missing.
+    """
+    with _lock:
+        if (name, backend) not in _models:
+            if backend == "torch":
+                # Imported here: sentence_transformers pulls in torch, which takes seconds to import.
+                from sentence_transformers import SentenceTransformer
+
+                model = SentenceTransformer(name)
+            else:
+                folder = onnx_root / name
+                if not (folder / ONNX_FILES[backend]).exists():
+                    export_onnx(name, folder, quantize=backend == "onnx-int8")
+                model = OnnxEncoder(folder, ONNX_FILES[backend], threads=int(os.getenv("ONNX_THREADS", 0)))
+            _models[name, backend] = model
+            print(f"Model {name} loaded ({backend}).")
+        return _models[name, backend]
+
+
+def export_onnx(name=MODEL_NAME, folder=None, quantize=True):
+    """
+    Export the transformer of the SentenceTransformer `name` to `folder`/model.onnx, with its fast tokenizer
+    (tokenizer.json) and the padding and truncation settings. With `quantize`, also write model_int8.onnx with
+    dynamically quantized int8 weights. Needs torch, onnx and onnxruntime. Return the folder.
+    """
+    import torch
+
+    folder = Path(folder or onnx_root / name)
+    folder.mkdir(parents=True, exist_ok=True)
+    transformer = get_model(name)[0]
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(str(folder))
+    (folder / ONNX_CONFIG).write_text(json.dumps({
+        "max_seq_length": transformer.max_seq_length, "pad_id": tokenizer.pad_token_id, "pad_token": tokenizer.pad_token,
+    }))
+
+    features = tokenizer(["warm up"], return_tensors="pt")
+    transformer.auto_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer.auto_model, tuple(features[key] for key in ONNX_INPUTS), str(folder / ONNX_FILES["onnx"]),
+            input_names=ONNX_INPUTS, output_names=["last_hidden_state"], opset_version=14,
+            dynamic_axes={key: {0: "batch", 1: "tokens"} for key in ONNX_INPUTS + ["last_hidden_state"]},
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(folder / ONNX_FILES["onnx"]), str(folder / ONNX_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+    print(f"Model {name} exported to {folder}.")
+    return folder
+
+
+def mean_pool(hidden, attention_mask):
+    """Average the token embeddings over the attention mask and scale each row to unit length."""
+    mask = attention_mask[..., None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+    return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+class OnnxEncoder:
+    """
+    A transformer exported by export_onnx, run by onnxruntime on the CPU behind the Rust `tokenizers` tokenizer,
+    followed by the mean pooling and normalization of all-MiniLM-L6-v2. `encode` returns the same float32 rows
+    as SentenceTransformer.encode, without loading torch.
+    """
+
+    def __init__(self, folder, filename=ONNX_FILES["onnx"], threads=0):
+        # Imported here, like sentence_transformers in get_model, so the torch backend does not pay for them.
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("The onnx query encoder needs onnxruntime and tokenizers: pip install onnxruntime onnx tokenizers")
+        folder = Path(folder)
+        config = json.loads((folder / ONNX_CONFIG).read_text())
+        self.tokenizer = Tokenizer.from_file(str(folder / "tokenizer.json"))
+        self.tokenizer.enable_truncation(config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_id"], pad_token=config["pad_token"])
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(str(folder / filename), options, providers=["CPUExecutionProvider"])
+        self.inputs = [node.name for node in self.session.get_inputs()]
+
+    def encode(self, sentences, batch_size=32):
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size)[0]
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(list(sentences[start:start + batch_size]))
+            features = {
+                "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: features[name] for name in self.inputs})[0]
+            batches.append(mean_pool(hidden, features["attention_mask"]))
+        if not batches:
+            return np.zeros((0, self.session.get_outputs()[0].shape[-1]), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32, copy=False)
+
+
+def normalize_query(query):
+    """Queries that differ only in surrounding or repeated whitespace share a cache entry."""
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class MicroBatcher:
+    """
+    Encodes the texts submitted by concurrent callers in shared batches on one worker thread. After the first
+    pending text the worker collects more for at most `max_wait_ms`, or until `max_batch` are pending, encodes
+    the distinct ones in one model.encode call and resolves each caller's future with its float32 row.
+    Texts that arrive while a batch is being encoded go into the next one.
+    """
+
+    def __init__(self, model, max_batch=BATCH_SIZE, max_wait_ms=BATCH_WAIT_MS):
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self.thread = threading.Thread(target=self.run, name="query encoder", daemon=True)
+        self.thread.start()
+
+    def submit(self, text):
+        """Queue `text` for the next batch; the returned Future resolves to its embedding."""
+        future = Future()
+        self.pending.put((text, future))
+        return future
+
+    def encode(self, texts):
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def collect(self):
+        """Block for the first pending text, then gather more until the batch is full or the wait is over."""
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            try:
+                batch.append(self.pending.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            stop = batch[-1] is None
+            requests = [request for request in batch if request is not None]
+            if requests:
+                self.encode_batch(requests)
+            if stop:
+                return
+
+    def encode_batch(self, requests):
+        texts = list(dict.fromkeys(text for text, _ in requests))
+        try:
+            # Copies, so a cached row does not keep its whole batch alive.
+            vectors = {text: row.copy() for text, row in zip(texts, np.asarray(self.model.encode(texts), dtype=np.float32))}
+        except Exception as error:
+            for _, future in requests:
+                future.set_exception(error)
+            return
+        for text, future in requests:
+            future.set_result(vectors[text])
+        with self.lock:
+            self.batches += 1
+            self.items += len(requests)
+            self.largest = max(self.largest, len(requests))
+
+    def close(self):
+        """Encode what is already queued, then stop the worker."""
+        self.pending.put(None)
+        self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "queries": self.items,
+                "mean_batch": self.items / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest,
+            }
+
+
+class QueryEncoder:
+    """
+    Encodes user queries with the shared model on `backend` (default QUERY_ENCODER_BACKEND), keeping recent query
+    embeddings in a TTLCache.
+    """
+
+    def __init__(self, name=MODEL_NAME, maxsize=CACHE_SIZE, ttl=CACHE_TTL, backend=None):
+        self.name = name
+        self.backend = backend or query_backend()
+        self.model = get_model(name, self.backend)
+        self.cache = TTLCache(maxsize, ttl)
+        self.batcher = MicroBatcher(self.model) if BATCH_SIZE > 0 else None
+
+    def encode(self, query):
+        return self.encode_many([query])[0]
+
+    def encode_many(self, queries):
+        """
+        Return one read-only float32 embedding per query, encoding only the ones not cached, in one batch that
+        the MicroBatcher shares with concurrent callers.
+        """
+        keys = [normalize_query(query) for query in queries]
+        found = {key: self.cache.get(key) for key in set(keys)}
+        missing = [key for key, vector in found.items() if vector is None]
+        if missing:
+            encoded = self.batcher.encode(missing) if self.batcher else np.asarray(self.model.encode(missing), dtype=np.float32)
+            for key, vector in zip(missing, encoded):
+                vector.setflags(write=False)
+                self.cache.put(key, vector)
+                found[key] = vector
+        return [found[key] for key in keys]
+
+    def warm_up(self):
+        """Run one encode so the first user query does not pay for lazy initialisation."""
+        self.model.encode(["warm up"])
+
+
+def get_query_encoder(name=MODEL_NAME, backend=None):
+    """Return the process-wide QueryEncoder for `name` and `backend`, creating and warming it on first use."""
+    backend = backend or query_backend()
+    with _lock:
+        encoder = _encoders.get((name, backend))
+        if encoder is None:
+            encoder = QueryEncoder(name, backend=backend)
+            encoder.warm_up()
+            _encoders[name, backend] = encoder
+        return encoder
+
+
+def warm_up_in_background(name=MODEL_NAME):
+    """
+    Load and warm the query encoder for `name` in a daemon thread, so startup does not wait for the model and
+    the first query finds it ready (or waits for the load already under way). Returns the thread.
+    """
+    thread = threading.Thread(target=get_query_encoder, args=(name,), name=f"warm-up {name}", daemon=True)
+    thread.start()
+    return thread
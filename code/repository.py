@@ -0,0 +1,102 @@
+from typing import NamedTuple
+
+import pandas as pd
+
+from code.database import get_engine, statement
+
+
+class FilterOptions(NamedTuple):
+    stars: list
+    countries: list
+    cuisines: list
+
+
+class FilteredRestaurant(NamedTuple):
+    name: str
+    cuisine: str
+    country: str
+    stars: int
+    price: int
+    description: str
+
+
+class NearbyRestaurant(NamedTuple):
+    name: str
+    food_type: str
+    address: str
+    stars_label: int
+    latitude: float
+    longitude: float
+    distance_km: float
+
+
+FILTER_OPTIONS_QUERY = "SELECT DISTINCT stars_label, country, food_type FROM cleaned_data_with_embeddings"
+
+FILTERED_QUERY = """
+    SELECT r.name, r.food_type, r.country, r.stars_label, r.price_symbol_count, r.description
+    FROM cleaned_data_with_embeddings r
+    WHERE {conditions}
+"""
+
+MAP_POINTS_QUERY = """
+    SELECT name, food_type, address, stars_label, latitude, longitude
+    FROM cleaned_data_with_embeddings
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+"""
+MAP_POINT_TYPES = {"latitude": "float64", "longitude": "float64"}
+
+# Nearest restaurants by the PostGIS KNN operator, served by the GiST index on location.
+NEAREST_QUERY = """
+    SELECT name, food_type, address, stars_label, latitude, longitude,
+           ST_Distance(location, point.geog) / 1000 AS distance_km
+    FROM cleaned_data_with_embeddings,
+         (SELECT CAST(ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326) AS geography) AS geog) AS point
+    WHERE location IS NOT NULL {radius}
+    ORDER BY location <-> point.geog
+    LIMIT :limit
+"""
+
+
+class RestaurantRepository:
+    """
+    The app's read queries, through the pooled engine: each method borrows one connection, runs a statement
+    built once (code.database.statement) and returns named tuples, or a typed DataFrame for the map's bulk rows.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+
+    def rows(self, sql, params, row_type):
+        with self.engine.connect() as conn:
+            return [row_type(*row) for row in conn.execute(statement(sql), params or {})]
+
+    def filter_options(self):
+        """The distinct star levels, countries and cuisines, sorted."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(statement(FILTER_OPTIONS_QUERY)).fetchall()
+        return FilterOptions(
+            stars=sorted({row[0] for row in rows if row[0] is not None}),
+            countries=sorted({row[1] for row in rows if row[1] is not None}),
+            cuisines=sorted({row[2] for row in rows if row[2] is not None}),
+        )
+
+    def filter_restaurants(self, filters):
+        """The restaurants matching a code.filters.Filters, as FilteredRestaurant tuples."""
+        conditions, params = filters.sql()
+        return self.rows(FILTERED_QUERY.format(conditions=conditions), params, FilteredRestaurant)
+
+    def map_points(self):
+        """Every geocoded restaurant's name, food type, address, stars and float coordinates."""
+        with self.engine.connect() as conn:
+            result = conn.execute(statement(MAP_POINTS_QUERY))
+            df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        return df.astype(MAP_POINT_TYPES)
+
+    def nearest(self, latitude, longitude, limit=10, radius_km=None):
+        """The `limit` restaurants nearest to a point, optionally only within `radius_km`, nearest first."""
+        params = {"latitude": latitude, "longitude": longitude, "limit": limit}
+        radius = ""
+        if radius_km is not None:
+            radius = "AND ST_DWithin(location, point.geog, :radius_m)"
+            params["radius_m"] = radius_km * 1000
+        return self.rows(NEAREST_QUERY.format(radius=radius), params, NearbyRestaurant)
@@ -0,0 +1,150 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Everything the scraper reads lives inside a <div>, so the strainer can drop <head>, scripts and the rest.
+DIV_STRAINER = SoupStrainer("div")
+
+NAME_CLASS = "col col-12 col-lg-12"
+BLOCK_CLASS = "data-sheet__block--text"
+SECTION_CLASS = "section section-main"
+CLASSIFICATION_CLASS = "data-sheet__classification-item--content"
+DESCRIPTION_CLASS = "data-sheet__description"
+MODAL_CLASS = "modal modal__common fade"
+
+
+class Bs4Nodes:
+    """Node access for BeautifulSoup with any of its tree builders ("html.parser", "lxml", ...)."""
+
+    def __init__(self, html, parser="html.parser", strain=False):
+        self.root = BeautifulSoup(html, parser, parse_only=DIV_STRAINER if strain else None)
+
+    def divs(self):
+        return self.root.find_all("div")
+
+    def classes(self, node):
+        return " ".join(node.get("class") or [])
+
+    def text(self, node):
+        return node.getText()
+
+    def descendants(self, node, tag, class_token=None):
+        if class_token:
+            return node.find_all(tag, class_=class_token)
+        return node.find_all(tag)
+
+
+class LxmlNodes:
+    """Node access for lxml.html, which parses in C and is several times faster than "html.parser"."""
+
+    def __init__(self, html, parser=None, strain=False):
+        self.root = lxml.html.fromstring(html)
+
+    def divs(self):
+        return self.root.iter("div")
+
+    def classes(self, node):
+        return " ".join(node.get("class", "").split())
+
+    def text(self, node):
+        return node.text_content()
+
+    def descendants(self, node, tag, class_token=None):
+        return [
+            child for child in node.iterdescendants(tag)
+            if class_token is None or class_token in child.get("class", "").split()
+        ]
+
+
+class SelectolaxNodes:
+    """Node access for selectolax with the Lexbor engine."""
+
+    def __init__(self, html, parser=None, strain=False):
+        self.root = LexborHTMLParser(html)
+
+    def divs(self):
+        return self.root.css("div")
+
+    def classes(self, node):
+        return " ".join((node.attributes.get("class") or "").split())
+
+    def text(self, node):
+        return node.text()
+
+    def descendants(self, node, tag, class_token=None):
+        selector = f"{tag}.{class_token}" if class_token else tag
+        return [child for child in node.css(selector) if child.mem_id != node.mem_id]
+
+
+BACKENDS = {
+    "html.parser": lambda html, strain: Bs4Nodes(html, "html.parser", strain),
+    "bs4-lxml": lambda html, strain: Bs4Nodes(html, "lxml", strain),
+    "lxml": lambda html, strain: LxmlNodes(html),
+    "selectolax": lambda html, strain: SelectolaxNodes(html),
+}
+
+
+def available_backends():
+    """Returns the names of the backends whose parser library is installed."""
+    names = ["html.parser"]
+    if lxml is not None:
+        names += ["bs4-lxml", "lxml"]
+    if LexborHTMLParser is not None:
+        names.append("selectolax")
+    return names
+
+
+DEFAULT_BACKEND = "lxml" if lxml is not None else "html.parser"
+
+
+def extract(html, backend=DEFAULT_BACKEND, strain=False):
+    """
+    Parses a restaurant page and returns every field the scraper needs from one walk over its <div> elements.
+    Gives the same values as get_name, get_address, get_country, get_price, get_type_food, get_stars,
+    get_description and get_facilities_services_info in scrape_res.py.
+    """
+    nodes = BACKENDS[backend](html, strain)
+
+    name_div = section = description = modal = None
+    blocks = []
+    for div in nodes.divs():
+        classes = nodes.classes(div)
+        if BLOCK_CLASS in classes.split():
+            blocks.append(div)
+        elif name_div is None and classes == NAME_CLASS:
+            name_div = div
+        elif section is None and classes == SECTION_CLASS:
+            section = div
+        elif description is None and DESCRIPTION_CLASS in classes.split():
+            description = div
+        elif modal is None and classes == MODAL_CLASS:
+            modal = div
+
+    address = nodes.text(blocks[0]).strip()
+    price_and_type = nodes.text(blocks[1])
+
+    stars = "Selected Restaurants"
+    rows = nodes.descendants(section, "div", "row")
+    if len(rows) > 1:
+        distinction_info = nodes.descendants(rows[0], "div", CLASSIFICATION_CLASS)
+        if len(distinction_info) > 0:
+            stars = nodes.text(distinction_info[1]).strip()
+
+    return {
+        "name": nodes.text(nodes.descendants(name_div, "h1")[0]),
+        "address": address,
+        "country": address.split(",")[-1].strip(),
+        "price": price_and_type.split()[0].strip(),
+        "stars": stars,
+        "description": nodes.text(description).strip(),
+        "facilities_services": [str(nodes.text(li).strip()) for li in nodes.descendants(modal, "li")],
+        "food type": price_and_type.split("·")[1].strip(),
+    }
@@ -1,29 +1,31 @@
 import os
 import json
-import csv
 
-from scrape_pages import scrape_all_pages
-from scrape_res import scrape_res
+from crawler import Crawler
+from ledger import FetchLedger
+from scrape_pages import URL
+from sinks import CsvSink, JsonlSink
 
 
-def scrape():
-    """Scrape everything and return a list of restaurants."""
-    res_urls = scrape_all_pages()
-    res = scrape_res(res_urls)
-    return res
+def scrape(listing_url=URL, concurrency=8, rate=5.0, ledger=None, resume=True, **kwargs):
+    """
+    Scrape everything, yielding restaurants one at a time as their pages are done.
+    With a FetchLedger the crawl resumes an interrupted run and skips unchanged pages; restaurants
+    already scraped by the resumed run are yielded again straight from the ledger.
+    """
+    crawler = Crawler(listing_url, concurrency=concurrency, rate=rate, ledger=ledger, resume=resume, **kwargs)
+    yield from crawler.crawl()
 
 def write_res_to_csv(reses, path):
-    with open (path, "w", newline = "") as file:
-        write = csv.DictWriter(file, reses[0].keys())
-        write.writeheader()
-        write.writerows(reses)
+    with CsvSink(path) as sink:
+        for res in reses:
+            sink.write(res)
     return
 
 def write_res_to_json(reses, path):
-    with open (path, "w", newline = "", encoding = "utf-8") as file:
+    with JsonlSink(path) as sink:
         for res in reses:
-            json.dump(res, file)
-            file.write("\n")
+            sink.write(res)
         
     pass
 
@@ -32,9 +34,23 @@ if __name__ == "__main__":
     BASE_DIR = "data"
     CSV_PATH = os.path.join(BASE_DIR, "raw_results.csv")
     JSONL_PATH = os.path.join(BASE_DIR, "raw_results.json")
+    LEDGER_PATH = os.path.join(BASE_DIR, "fetch_ledger.sqlite")
+    DELTA_PATH = os.path.join(BASE_DIR, "delta.json")
     os.makedirs(BASE_DIR, exist_ok=True)
 
-    reses = scrape()
-
-    write_res_to_csv(reses, CSV_PATH)
-    write_res_to_json(reses, JSONL_PATH)
+    ledger = FetchLedger(LEDGER_PATH)
+
+    # Each restaurant is appended to both outputs as soon as it is scraped, so memory stays flat
+    # and an interrupted crawl leaves its finished segments next to the outputs.
+    with CsvSink(CSV_PATH) as csv_sink, JsonlSink(JSONL_PATH) as jsonl_sink:
+        for res in scrape(ledger=ledger):
+            csv_sink.write(res)
+            jsonl_sink.write(res)
+
+    run = ledger.last_run()
+    if run["finished_at"] is not None:
+        with open(DELTA_PATH, "w", encoding = "utf-8") as file:
+            json.dump(ledger.delta(run["run_id"]), file)
+    else:
+        print("Some pages failed; run `python3 code/scrape.py` again to resume the crawl.")
+    ledger.close()
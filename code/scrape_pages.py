@@ -1,21 +1,24 @@
-
 from common import get_soup
+BASE_URL = "https://guide.michelin.com/"
 URL = "https://guide.michelin.com/us/en/restaurants/all-starred/bib-gourmand/page/"
 
 
-def scrape_page(num):
-    """Takes a page and returns a list of links to the restaurant that are on the page."""
-    url = URL + str(num)
-    res_links = get_soup(url).find_all("h3", class_ = "card__menu-content--title pl-text pl-big js-match-height-title")
+def parse_page_links(soup, base_url=BASE_URL):
+    """Takes the soup of a listing page and returns the links to the restaurants on it."""
+    res_links = soup.find_all("h3", class_ = "card__menu-content--title pl-text pl-big js-match-height-title")
     links = []
     for res in res_links:
         for a_tag in res.find_all("a", href = True):
             href = a_tag.get("href")
-            full_link = "https://guide.michelin.com/" + str(href)
+            full_link = base_url + str(href)
             links.append(full_link)
 
     return links
 
+def scrape_page(num, url=URL, session=None):
+    """Takes a page and returns a list of links to the restaurant that are on the page."""
+    return parse_page_links(get_soup(url + str(num), session))
+
 def scrape_all_pages():
     """Scrapes all pages, returning a list of reatsaurant links."""
     page = 1
@@ -34,4 +37,3 @@ def scrape_all_pages():
 
     return links
     
-
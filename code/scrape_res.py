@@ -1,12 +1,6 @@
-from common import get_soup
-import googlemaps
-import requests
-import os
-import sys
-import dotenv
-dotenv.load_dotenv(".env")
-GOOGLE_PLACE_API_KEY = os.environ["GOOGLE_PLACE_API_KEY"]
-map_client = googlemaps.Client(GOOGLE_PLACE_API_KEY)
+from common import get_html
+from geocoder import get_geocoder
+from res_parser import extract
 
 def get_name(soup):
     """ Extracts the title from the BeautifulSoup instance representing a restaurant page as a string."""
@@ -65,41 +59,38 @@ def get_facilities_services_info(soup):
     return facil_serv_list
 
 def get_res_lat_long(soup):
-    name = get_name(soup)
-    country = get_country(soup)
-    query_request = f"{name}, {country}"
-    response = map_client.places(query = query_request)
-    results = response.get("results")
-    if len(results) > 0:
-        lat_long = results[0]["geometry"]["location"]
-    else:
-        lat_long = "N/A"
-    return lat_long
+    return lookup_lat_long(get_name(soup), get_country(soup))
 
+def lookup_lat_long(name, country):
+    """Looks up the coordinates of a restaurant, answering from the geocode cache when possible."""
+    return get_geocoder().geocode(name, country)
 
-def scrape_res_dict(res_url):
-    soup = get_soup(res_url)
-    #dict_info = get_res_information(soup)
+
+def parse_res(html, geocode=lookup_lat_long):
+    """Builds the restaurant dictionary from the HTML of a restaurant page. Pass geocode=None to skip the Places lookup."""
+    fields = extract(html)
     scraped_res_dict = {
-        "name": get_name(soup),
-        "address": get_address(soup),
-        "price": get_price(soup),
-        "stars": get_stars(soup),
-        "description": get_description(soup),
-        "facilities_services": get_facilities_services_info(soup),
+        "name": fields["name"],
+        "address": fields["address"],
+        "price": fields["price"],
+        "stars": fields["stars"],
+        "description": fields["description"],
+        "facilities_services": fields["facilities_services"],
         #"rating": dict_info["rating"],
-        "latitude and longitude": get_res_lat_long(soup),
+        "latitude and longitude": geocode(fields["name"], fields["country"]) if geocode else "N/A",
         #"numbers of users' reviews": dict_info["numbers of reviews"]
-        "food type": get_type_food(soup)
+        "food type": fields["food type"]
     }
     return scraped_res_dict
 
+def scrape_res_dict(res_url, session=None):
+    html = get_html(res_url, session)
+    #dict_info = get_res_information(soup)
+    return parse_res(html)
+
 def scrape_res(res_urls):
-    scrape_res_info = []
+    """Yields the restaurant dictionary of each url in turn."""
     for res_url in res_urls:
-        scraped_res = scrape_res_dict(res_url)
-        scrape_res_info.append(scraped_res)
-        
-    return scrape_res_info
+        yield scrape_res_dict(res_url)
 
 
@@ -0,0 +1,164 @@
+import abc
+import csv
+import glob
+import json
+import os
+
+
+class SegmentSink(abc.ABC):
+    """
+    Appends records to an output file as they arrive instead of holding them all in memory.
+
+    Records go to numbered segments next to the output (`raw_results.json.00001.part`, ...). The open segment is
+    flushed and fsynced every `fsync_every` records; after `rotate_every` records it is closed and atomically renamed
+    to its final name (`raw_results.json.00001`), so a crash loses at most the unsynced tail of the open segment.
+    close() merges the segments into the output file with an atomic rename and removes them.
+    Segments left behind by an interrupted crawl are first merged into `<output>.recovered`, so a new crawl
+    never overwrites them.
+    """
+
+    # Whether every segment starts with a header line, of which the merged file keeps one.
+    segment_headers = False
+
+    def __init__(self, path, fsync_every=100, rotate_every=1000):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.rotate_every = rotate_every
+        self.segment = 0
+        self.file = None
+        self.count = 0
+        self.written = 0
+        if segment_paths(path, include_open=True):
+            recovered = recover(path, path + ".recovered")
+            print(f"Segments of an interrupted crawl were merged into {recovered}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep what has been written so far; recover() can merge it later.
+            self.rotate()
+
+    def open_segment(self):
+        self.segment += 1
+        self.count = 0
+        self.file = open(f"{self.path}.{self.segment:05d}.part", "w", newline = "", encoding = "utf-8")
+
+    def write(self, record):
+        if self.file is None:
+            self.open_segment()
+        self.write_record(record)
+        self.count += 1
+        self.written += 1
+        if self.count % self.fsync_every == 0:
+            self.sync()
+        if self.count >= self.rotate_every:
+            self.rotate()
+
+    @abc.abstractmethod
+    def write_record(self, record):
+        """Writes one record to the open segment."""
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def rotate(self):
+        """Closes the open segment and publishes it under its final name."""
+        if self.file is None:
+            return
+        self.sync()
+        self.file.close()
+        os.replace(self.file.name, self.file.name[: -len(".part")])
+        self.file = None
+
+    def close(self):
+        """Publishes the last segment and merges every segment into the output file."""
+        self.rotate()
+        merge_segments(self.path, self.segment_headers)
+
+
+class JsonlSink(SegmentSink):
+    """Writes one JSON object per line, like write_res_to_json."""
+
+    def write_record(self, record):
+        json.dump(record, self.file)
+        self.file.write("\n")
+
+
+class CsvSink(SegmentSink):
+    """
+    Writes CSV rows whose columns are the keys of the first record, like write_res_to_csv. Each segment starts
+    with the header row, so the segments of an interrupted crawl can be merged without the sink.
+    """
+
+    segment_headers = True
+
+    def __init__(self, path, fsync_every=100, rotate_every=1000):
+        super().__init__(path, fsync_every, rotate_every)
+        self.fieldnames = None
+        self.writer = None
+
+    def open_segment(self):
+        super().open_segment()
+        self.writer = None
+
+    def write_record(self, record):
+        if self.fieldnames is None:
+            self.fieldnames = list(record.keys())
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, self.fieldnames)
+            self.writer.writeheader()
+        self.writer.writerow(record)
+
+
+def segment_paths(path, include_open=False):
+    """Returns the segments of an output file in order, optionally including the one still being written."""
+    paths = sorted(glob.glob(glob.escape(path) + ".[0-9][0-9][0-9][0-9][0-9]"))
+    if include_open:
+        paths = sorted(paths + glob.glob(glob.escape(path) + ".[0-9][0-9][0-9][0-9][0-9].part"))
+    return paths
+
+
+def merge_segments(path, segment_headers=False, include_open=False, target=None):
+    """
+    Concatenates the segments of an output file into it (or into `target`) with an atomic rename, then removes
+    the segments. With `segment_headers` the first line of every segment is a header, written once.
+    """
+    segments = segment_paths(path, include_open)
+    target = target or path
+    tmp_path = target + ".tmp"
+    header = None
+    with open(tmp_path, "w", newline = "", encoding = "utf-8") as out:
+        for segment in segments:
+            with open(segment, newline = "", encoding = "utf-8") as file:
+                data = file.read()
+            if segment.endswith(".part") and not data.endswith("\n"):
+                # Drop a line that was cut off by a crash.
+                data = data[: data.rfind("\n") + 1]
+            if segment_headers and data:
+                line, data = data.split("\n", 1)
+                if header is None:
+                    header = line + "\n"
+                    out.write(header)
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, target)
+    for segment in segments:
+        os.remove(segment)
+
+
+def recover(path, target=None):
+    """
+    Turns the segments left behind by an interrupted crawl into a usable file: the output itself, or `target`.
+    Segments of a .csv output are merged under a single header row. Returns the file written.
+    """
+    target = target or path
+    if target != path and os.path.exists(target):
+        raise FileExistsError(f"{target} already exists; move it away before recovering {path} again.")
+    merge_segments(path, path.endswith(".csv"), include_open=True, target=target)
+    return target
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+
+EARTH_RADIUS_KM = 6371.0088
+# Web Mercator stops at this latitude; map tiles are 256 px squares, 2 ** zoom of them across the world.
+MAX_LATITUDE = 85.05112878
+TILE_SIZE = 256
+# Clusters are precomputed down to this zoom level; closer in, every restaurant gets its own marker.
+MAX_CLUSTER_ZOOM = 13
+CELLS_PER_TILE = 4
+
+
+def point_coordinates(frame):
+    """Latitude and longitude arrays of a frame: its latitude/longitude columns, or the point geometry."""
+    if "latitude" in frame and "longitude" in frame:
+        return frame["latitude"].to_numpy(dtype=float), frame["longitude"].to_numpy(dtype=float)
+    return frame.geometry.y.to_numpy(dtype=float), frame.geometry.x.to_numpy(dtype=float)
+
+
+class SpatialIndex:
+    """
+    BallTree with the haversine metric over the restaurants of a (Geo)DataFrame, built once.
+    Queries return new frames with a `distance_km` column (great-circle distance); the indexed frame is
+    never modified, so it can be shared between reruns and sessions.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        latitudes, longitudes = point_coordinates(frame)
+        self.tree = BallTree(np.radians(np.column_stack([latitudes, longitudes])), metric="haversine")
+
+    def __len__(self):
+        return len(self.frame)
+
+    def nearest(self, latitude, longitude, k=10):
+        """The k restaurants closest to a point, nearest first."""
+        k = min(k, len(self.frame))
+        if k == 0:
+            return self.frame.iloc[:0].assign(distance_km=[])
+        distances, rows = self.tree.query(np.radians([[latitude, longitude]]), k=k)
+        return self.rows(rows[0], distances[0])
+
+    def within(self, latitude, longitude, radius_km):
+        """All restaurants within `radius_km` of a point, nearest first."""
+        rows, distances = self.tree.query_radius(
+            np.radians([[latitude, longitude]]), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+        )
+        return self.rows(rows[0], distances[0])
+
+    def rows(self, rows, distances):
+        return self.frame.iloc[rows].assign(distance_km=distances * EARTH_RADIUS_KM)
+
+
+def tile_coordinates(latitudes, longitudes, zoom):
+    """Fractional Web Mercator tile coordinates (x east, y south) of points at a zoom level."""
+    scale = 2.0 ** zoom
+    latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(longitudes) + 180.0) / 360.0 * scale
+    y = (1.0 - np.arcsinh(np.tan(latitudes)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+def viewport(latitude, longitude, zoom, width, height):
+    """(south, west, north, east) of a map of `width` x `height` px centred on a point, before the map reports its own."""
+    x, y = tile_coordinates(latitude, longitude, zoom)
+    half_width, half_height = width / 2 / TILE_SIZE, height / 2 / TILE_SIZE
+    scale = 2.0 ** zoom
+
+    def latitude_of(tile_y):
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.clip(tile_y, 0, scale) / scale)))))
+
+    return (
+        latitude_of(y + half_height), float((x - half_width) / scale * 360 - 180),
+        latitude_of(y - half_height), float((x + half_width) / scale * 360 - 180),
+    )
+
+
+class ClusterGrid:
+    """
+    The restaurants of a (Geo)DataFrame grouped into grid cells at every zoom level up to `max_zoom`, computed once.
+    A cell is 1/cells_per_tile of a map tile across, so clusters cover about the same screen area at every zoom.
+    Each level holds the count and mean position of the restaurants of each cell and the frame position of one of them.
+    Like SpatialIndex, it never modifies the frame and can be shared between reruns and sessions.
+    """
+
+    def __init__(self, frame, max_zoom=MAX_CLUSTER_ZOOM, cells_per_tile=CELLS_PER_TILE):
+        self.frame = frame
+        self.max_zoom = max_zoom
+        latitudes, longitudes = point_coordinates(frame)
+        located = np.isfinite(latitudes) & np.isfinite(longitudes)
+        self.points = pd.DataFrame({
+            "latitude": latitudes[located], "longitude": longitudes[located],
+            "count": 1, "row": np.flatnonzero(located),
+        })
+        self.levels = [self.cluster(zoom, cells_per_tile) for zoom in range(max_zoom + 1)]
+
+    def cluster(self, zoom, cells_per_tile):
+        x, y = tile_coordinates(self.points["latitude"].to_numpy(), self.points["longitude"].to_numpy(), zoom)
+        side = 2 ** zoom * cells_per_tile
+        columns = np.minimum((x * cells_per_tile).astype(np.int64), side - 1)
+        rows = np.minimum((y * cells_per_tile).astype(np.int64), side - 1)
+        _, first, inverse, counts = np.unique(columns * side + rows, return_index=True, return_inverse=True, return_counts=True)
+        return pd.DataFrame({
+            "latitude": np.bincount(inverse, self.points["latitude"]) / counts,
+            "longitude": np.bincount(inverse, self.points["longitude"]) / counts,
+            "count": counts,
+            "row": self.points["row"].to_numpy()[first],
+        })
+
+    def markers(self, south, west, north, east, zoom):
+        """
+        The markers to draw for a viewport: one row per cluster of the zoom level (or per restaurant beyond
+        `max_zoom`) whose position is inside the bounds, with latitude, longitude, count and row.
+        Rows with a count of 1 are single restaurants, at frame position `row`.
+        """
+        level = self.points if zoom > self.max_zoom else self.levels[max(int(zoom), 0)]
+        latitudes, longitudes = level["latitude"].to_numpy(), level["longitude"].to_numpy()
+        inside = (latitudes >= south) & (latitudes <= north)
+        if east - west < 360:
+            # Leaflet reports longitudes past +-180 once the map has been panned around the world.
+            west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+            if west <= east:
+                inside &= (longitudes >= west) & (longitudes <= east)
+            else:
+                inside &= (longitudes >= west) | (longitudes <= east)
+        return level[inside]
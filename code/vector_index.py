@@ -0,0 +1,521 @@
+import os
+import numpy as np
+from pathlib import Path
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Approximate indexes persisted next to the embedding artifacts, one file per kind.
+INDEX_FILES = {"ivf": "ann_ivf.npz", "hnsw": "ann_hnsw.bin"}
+# Compressed copies of the embeddings for QuantizedIndex, one file per storage mode; float32 is embeddings.npy itself.
+QUANTIZED_FILES = {"float16": "embeddings_float16.npz", "int8": "embeddings_int8.npz", "binary": "embeddings_binary.npz"}
+STORAGE_MODES = ["float32", *QUANTIZED_FILES]
+# Set bits of every byte value, for Hamming distances on numpy versions without np.bitwise_count.
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity search over a matrix of embeddings.
+
+    The matrix is copied once into memory as L2-normalized float32 and marked read-only, so a query is a single
+    matrix product followed by argpartition. Nothing is mutated after construction, which makes one index safe
+    to share between threads (e.g. concurrent Streamlit sessions).
+    """
+
+    def __init__(self, ids, matrix):
+        matrix = np.array(matrix, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(ids):
+            raise ValueError("matrix must be 2-D with one row per id")
+        self.matrix = normalize(matrix)
+        self.matrix.setflags(write=False)
+        self.ids = np.asarray(ids)
+        self.ids.setflags(write=False)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def search(self, query, k=20, threshold=None, mask=None):
+        """
+        Return (positions, scores) of the k rows most similar to one query vector, best first.
+        Rows scoring at or below `threshold` are left out. Positions index into self.ids.
+        With a boolean `mask` over the rows only the rows it selects are scored, so filtered searches still return k rows.
+        """
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, threshold, mask)[0]
+
+    def search_batch(self, queries, k=20, threshold=None, mask=None):
+        """Run search() for every row of a (n_queries, dim) array with one matrix product."""
+        queries = normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        if mask is None:
+            return [top_k(row, k, threshold) for row in queries @ self.matrix.T]
+        return search_rows(self.matrix, np.flatnonzero(mask), queries, k, threshold)
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF-flat) index: the normalized rows are grouped by their nearest of `nlist` centroids
+    found with spherical k-means, and a query only scores the rows of its `nprobe` nearest groups.
+    Raising nprobe trades latency for recall; nprobe == nlist is exact search.
+
+    search_batch() only reads the arrays, so concurrent searches are safe; add() replaces them and must not
+    run at the same time as a search.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, centroids, ids, matrix, nprobe=8):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, self.centroids.shape[1]), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int64)
+        self.add(ids, matrix)
+
+    @classmethod
+    def build(cls, ids, matrix, nlist=None, nprobe=8, iterations=10, seed=0):
+        matrix = normalize(np.asarray(matrix, dtype=np.float32))
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(len(matrix))))
+        return cls(train_centroids(matrix, nlist, iterations, seed), ids, matrix, nprobe)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.centroids.shape[1]
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def add(self, ids, matrix):
+        """
+        Insert rows, or replace the vectors of ids that are already indexed. Only new or changed rows are
+        assigned to a centroid; the centroids themselves are kept, so rebuild after large changes.
+        """
+        ids, matrix = np.asarray(ids, dtype=np.int64), normalize(np.asarray(matrix, dtype=np.float32).reshape(-1, self.dim))
+        rows, fresh = locate(self.ids, ids)
+        stale = rows >= 0
+        changed = stale.copy()
+        changed[stale] = ~np.isclose(self.matrix[rows[stale]], matrix[stale], atol=1e-6).all(axis=1)
+
+        all_ids = np.concatenate([self.ids, ids[fresh]])
+        all_matrix = np.concatenate([self.matrix, matrix[fresh]])
+        all_matrix[rows[changed]] = matrix[changed]
+        assignments = np.concatenate([self.assignments, np.zeros(fresh.sum(), dtype=np.int64)])
+        touched = np.concatenate([rows[changed], np.arange(len(self.ids), len(all_ids))])
+        if len(touched):
+            assignments[touched] = np.argmax(all_matrix[touched] @ self.centroids.T, axis=1)
+
+        order = np.argsort(assignments, kind="stable")
+        self.offsets = np.searchsorted(assignments[order], np.arange(self.nlist + 1))
+        self.ids, self.matrix, self.assignments, self.order = all_ids, all_matrix, assignments, order
+        return int(fresh.sum()), int(changed.sum())
+
+    def search(self, query, k=20, threshold=None, mask=None, nprobe=None):
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, threshold, mask, nprobe)[0]
+
+    def search_batch(self, queries, k=20, threshold=None, mask=None, nprobe=None):
+        """
+        Return (positions, scores) per query like VectorIndex.search_batch(), scoring only the probed lists.
+        With a `mask`, rows outside it are skipped; if the probed lists hold fewer than k selected rows,
+        all selected rows are scored exactly instead.
+        """
+        queries = normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            if mask is not None:
+                rows = rows[mask[rows]]
+                if len(rows) < k:
+                    results.extend(search_rows(self.matrix, np.flatnonzero(mask), query[None], k, threshold))
+                    continue
+            positions, scores = top_k(self.matrix[rows] @ query, k, threshold)
+            results.append((rows[positions], scores))
+        return results
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, ids=self.ids, matrix=self.matrix, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path, nprobe=None):
+        with np.load(path) as data:
+            index = cls.__new__(cls)
+            index.centroids, index.nprobe = data["centroids"], int(nprobe or data["nprobe"])
+            index.ids = np.empty(0, dtype=np.int64)
+            index.matrix = np.empty((0, index.centroids.shape[1]), dtype=np.float32)
+            index.assignments = np.empty(0, dtype=np.int64)
+            index.add(data["ids"], data["matrix"])
+        return index
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small world graph from hnswlib (optional dependency) over the normalized rows.
+    `m` and `ef_construction` set the graph quality at build time, `ef` the breadth of each search:
+    a larger ef gives better recall and slower queries.
+
+    hnswlib answers concurrent queries safely, and searches never change ef (hnswlib searches with max(ef, k));
+    set_ef() and add() must not overlap with searches.
+    """
+
+    kind = "hnsw"
+    oversample = 4
+
+    def __init__(self, dim, m=16, ef_construction=200, ef=64):
+        if hnswlib is None:
+            raise ImportError("The hnsw index needs hnswlib: pip install hnswlib")
+        self.graph = hnswlib.Index(space="ip", dim=dim)
+        self.m, self.ef_construction, self.ef = m, ef_construction, ef
+        self.ids = np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def build(cls, ids, matrix, m=16, ef_construction=200, ef=64):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        index = cls(matrix.shape[1], m, ef_construction, ef)
+        index.graph.init_index(max_elements=max(len(matrix), 1), M=m, ef_construction=ef_construction)
+        index.graph.set_ef(ef)
+        index.add(ids, matrix)
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.graph.dim
+
+    def add(self, ids, matrix):
+        """Insert rows, or replace the vectors of ids that are already indexed; unchanged rows are skipped."""
+        ids, matrix = np.asarray(ids, dtype=np.int64), normalize(np.asarray(matrix, dtype=np.float32).reshape(-1, self.dim))
+        rows, fresh = locate(self.ids, ids)
+        stale = rows >= 0
+        changed = stale.copy()
+        if stale.any():
+            stored = np.asarray(self.graph.get_items(rows[stale]), dtype=np.float32)
+            changed[stale] = ~np.isclose(stored, matrix[stale], atol=1e-6).all(axis=1)
+
+        labels = np.concatenate([rows[changed], np.arange(len(self.ids), len(self.ids) + fresh.sum())])
+        vectors = np.concatenate([matrix[changed], matrix[fresh]])
+        if len(labels):
+            if len(self.ids) + fresh.sum() > self.graph.get_max_elements():
+                self.graph.resize_index(int((len(self.ids) + fresh.sum()) * 1.25))
+            self.graph.add_items(vectors, labels)
+        self.ids = np.concatenate([self.ids, ids[fresh]])
+        return int(fresh.sum()), int(changed.sum())
+
+    def set_ef(self, ef):
+        """Change the search breadth; not safe while other threads search."""
+        self.ef = ef
+        self.graph.set_ef(ef)
+
+    def search(self, query, k=20, threshold=None, mask=None):
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, threshold, mask)[0]
+
+    def search_batch(self, queries, k=20, threshold=None, mask=None):
+        """
+        Return (positions, scores) per query like VectorIndex.search_batch().
+        With a `mask` the graph is searched for `oversample` times k rows and those outside the mask dropped;
+        if fewer than k remain, the selected rows are scored exactly instead.
+        """
+        queries = normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        k = min(k, len(self.ids))
+        if k == 0:
+            return [top_k(np.empty(0, dtype=np.float32), 0) for _ in queries]
+        wanted = k if mask is None else min(k * self.oversample, len(self.ids))
+        labels, distances = self.graph.knn_query(queries, k=wanted)
+        results = []
+        # With the inner-product space hnswlib reports 1 - dot, i.e. the cosine distance of normalized rows.
+        for query, positions, scores in zip(queries, labels.astype(np.int64), 1 - distances):
+            if mask is not None:
+                keep = mask[positions]
+                if keep.sum() < k:
+                    rows = np.flatnonzero(mask)
+                    vectors = np.asarray(self.graph.get_items(rows), dtype=np.float32).reshape(-1, self.dim)
+                    positions, scores = top_k(vectors @ query, k, threshold)
+                    results.append((rows[positions], scores))
+                    continue
+                positions, scores = positions[keep][:k], scores[keep][:k]
+            if threshold is not None:
+                keep = scores > threshold
+                positions, scores = positions[keep], scores[keep]
+            results.append((positions, scores))
+        return results
+
+    def save(self, path):
+        self.graph.save_index(str(path))
+        np.savez(Path(path).with_suffix(".npz"), ids=self.ids, dim=self.dim, m=self.m, ef_construction=self.ef_construction, ef=self.ef)
+
+    @classmethod
+    def load(cls, path, ef=None):
+        with np.load(Path(path).with_suffix(".npz")) as data:
+            ids, dim, m, ef_construction, saved_ef = (data["ids"], int(data["dim"]), int(data["m"]),
+                                                      int(data["ef_construction"]), int(data["ef"]))
+        index = cls(dim, m, ef_construction, ef or saved_ef)
+        index.graph.load_index(str(path))
+        index.graph.set_ef(index.ef)
+        index.ids = ids
+        return index
+
+
+class QuantizedIndex:
+    """
+    Exact search over compressed embeddings, with the same search interface as VectorIndex.
+
+    "float16" halves the memory of float32 and "int8" (scalar quantization, one scale per dimension) quarters it;
+    rows are scored from the codes, block by block. "binary" keeps one sign bit per dimension (1/32 of float32),
+    ranks the rows by Hamming distance to the query's signs and rescores the best `oversample` * k with the
+    full-precision vectors. Those stay in `source` (normally the memory-mapped embeddings.npy), so only the
+    candidates are read. float16 and int8 rescore the same way when `rescore` is set.
+    Nothing is modified after construction, so one index can be shared between threads.
+    """
+
+    def __init__(self, ids, codes, storage, scale=None, source=None, oversample=10, rescore=None, block_rows=4096):
+        if storage not in QUANTIZED_FILES:
+            raise ValueError(f"storage must be one of {list(QUANTIZED_FILES)}")
+        self.ids = np.asarray(ids)
+        self.codes, self.storage, self.scale, self.source = codes, storage, scale, source
+        self.oversample, self.block_rows = oversample, block_rows
+        # Hamming distances are not similarities, so binary codes are always rescored.
+        self.rescore = storage == "binary" or bool(rescore)
+        if self.rescore and source is None:
+            raise ValueError("rescoring needs the full-precision source matrix")
+        self.dim = codes.shape[1] * 8 if storage == "binary" else codes.shape[1]
+
+    @classmethod
+    def build(cls, ids, matrix, storage="int8", block_rows=4096, **params):
+        """Encode a (possibly memory-mapped) matrix block by block; it is kept as the rescoring source."""
+        scale = None
+        if storage == "int8":
+            peak = np.zeros(matrix.shape[1], dtype=np.float32)
+            for start in range(0, len(matrix), block_rows):
+                block = normalize(np.asarray(matrix[start:start + block_rows], dtype=np.float32))
+                peak = np.maximum(peak, np.abs(block).max(axis=0))
+            scale = np.where(peak > 0, peak / 127, 1).astype(np.float32)
+        blocks = []
+        for start in range(0, len(matrix), block_rows):
+            blocks.append(encode_rows(normalize(np.asarray(matrix[start:start + block_rows], dtype=np.float32)), storage, scale))
+        codes = np.concatenate(blocks) if blocks else encode_rows(np.empty((0, matrix.shape[1]), dtype=np.float32), storage, scale)
+        return cls(ids, codes, storage, scale, matrix, block_rows=block_rows, **params)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        """Memory held by the codes; the rescoring source is not counted, as it stays on disk."""
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def search(self, query, k=20, threshold=None, mask=None):
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, threshold, mask)[0]
+
+    def search_batch(self, queries, k=20, threshold=None, mask=None):
+        """Return (positions, scores) per query like VectorIndex.search_batch()."""
+        queries = normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        wanted = min(k * self.oversample, len(self.ids)) if self.rescore else k
+        if self.storage == "binary":
+            # Fewer differing signs is closer; the negated distance ranks like a similarity.
+            scores = -np.stack([self.hamming(code) for code in encode_rows(queries, "binary")]).astype(np.float32)
+        else:
+            scores = self.scores(queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        results = []
+        for query, row in zip(queries, scores):
+            candidates, approximate = top_k(row, wanted)
+            selected = np.isfinite(approximate)
+            candidates, approximate = candidates[selected], approximate[selected]
+            if self.rescore:
+                # In row order, the candidates are read from the memory-mapped source front to back.
+                candidates = np.sort(candidates)
+                positions, exact = top_k(normalize(np.asarray(self.source[candidates], dtype=np.float32)) @ query, k, threshold)
+                results.append((candidates[positions], exact))
+            else:
+                above = approximate > threshold if threshold is not None else slice(None)
+                results.append((candidates[above], approximate[above]))
+        return results
+
+    def scores(self, queries):
+        """Approximate cosine similarity of every row to each query, decoding the codes block by block."""
+        weights = queries * self.scale if self.storage == "int8" else queries
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), self.block_rows):
+            block = self.codes[start:start + self.block_rows].astype(np.float32)
+            scores[:, start:start + len(block)] = weights @ block.T
+        return scores
+
+    def hamming(self, code):
+        """Number of differing sign bits between one packed query code and every row."""
+        differing = np.bitwise_xor(self.codes, code)
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(differing).sum(axis=1, dtype=np.int32)
+        return POPCOUNT[differing].sum(axis=1, dtype=np.int32)
+
+    def save(self, path):
+        np.savez(path, ids=self.ids, codes=self.codes, storage=self.storage,
+                 scale=self.scale if self.scale is not None else np.empty(0, dtype=np.float32))
+
+    @classmethod
+    def load(cls, path, source=None, **params):
+        with np.load(path) as data:
+            scale = data["scale"] if len(data["scale"]) else None
+            return cls(data["ids"], data["codes"], str(data["storage"]), scale, source, **params)
+
+
+def encode_rows(matrix, storage, scale=None):
+    """Codes of normalized float32 rows in a QuantizedIndex storage mode."""
+    if storage == "float16":
+        return matrix.astype(np.float16)
+    if storage == "int8":
+        return np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    return np.packbits(matrix > 0, axis=1)
+
+
+ANN_INDEXES = {"ivf": IVFIndex, "hnsw": HNSWIndex}
+
+
+def load_index(kind, folder):
+    """Load a persisted approximate index, with the search knob taken from ANN_NPROBE / ANN_EF when set."""
+    path = Path(folder) / INDEX_FILES[kind]
+    if kind == "ivf":
+        return IVFIndex.load(path, nprobe=int(os.getenv("ANN_NPROBE", 0)) or None)
+    return HNSWIndex.load(path, ef=int(os.getenv("ANN_EF", 0)) or None)
+
+
+def sync_index(kind, ids, matrix, folder, **params):
+    """
+    Bring the persisted index of `kind` in line with (ids, matrix): new rows are inserted and changed rows
+    replaced incrementally. The index is built from scratch when none exists yet or ids were removed.
+    The file is only written when the index changed.
+    """
+    path = Path(folder) / INDEX_FILES[kind]
+    ids = np.asarray(ids, dtype=np.int64)
+    index = load_index(kind, folder) if path.exists() else None
+    if index is not None and np.isin(index.ids, ids).all():
+        added, replaced = index.add(ids, matrix)
+        print(f"{kind} index: {added} rows added, {replaced} replaced.")
+        if not (added or replaced):
+            return index
+    else:
+        index = ANN_INDEXES[kind].build(ids, matrix, **params)
+        print(f"{kind} index: built over {len(index)} rows.")
+    index.save(path)
+    return index
+
+
+def sync_indexes(ids, matrix, folder):
+    """Update every approximate index and re-encode every compressed copy that has been persisted in `folder`."""
+    indexes = [sync_index(kind, ids, matrix, folder) for kind, name in INDEX_FILES.items() if (Path(folder) / name).exists()]
+    for storage, name in QUANTIZED_FILES.items():
+        if (Path(folder) / name).exists():
+            QuantizedIndex.build(ids, matrix, storage).save(Path(folder) / name)
+            print(f"{storage} embeddings: encoded {len(ids)} rows.")
+    return indexes
+
+
+def open_quantized(storage, ids, matrix, folder, **params):
+    """
+    The QuantizedIndex of `storage` over (ids, matrix): loaded from its file in `folder` when that was
+    written for the same ids, otherwise encoded and saved there. `matrix` is the rescoring source.
+    Changed vectors under the same ids are not detected here; code/embedding.py and update_embeddings
+    re-encode every persisted file whenever the embeddings are written.
+    """
+    path = Path(folder) / QUANTIZED_FILES[storage]
+    if path.exists():
+        index = QuantizedIndex.load(path, matrix, **params)
+        if np.array_equal(index.ids, ids):
+            return index
+    index = QuantizedIndex.build(ids, matrix, storage, **params)
+    index.save(path)
+    return index
+
+
+def open_index(ids, matrix, folder, kind=None, storage=None):
+    """
+    Return the index match() searches: exact VectorIndex by default, or the persisted approximate index
+    named by `kind` / the MATCH_INDEX environment variable ("exact", "ivf" or "hnsw").
+    For exact search, `storage` / MATCH_STORAGE ("float16", "int8" or "binary") searches compressed embeddings
+    instead of float32; MATCH_RESCORE=1 rescores float16 and int8 candidates with the full vectors, and
+    MATCH_OVERSAMPLE (default 10) sets how many candidates per result are rescored.
+    """
+    kind = kind or os.getenv("MATCH_INDEX", "exact")
+    storage = storage or os.getenv("MATCH_STORAGE", "float32")
+    if kind == "exact":
+        if storage == "float32":
+            return VectorIndex(ids, matrix)
+        rescore = os.getenv("MATCH_RESCORE", "").lower() in ("1", "true", "yes")
+        return open_quantized(storage, ids, matrix, folder, rescore=rescore, oversample=int(os.getenv("MATCH_OVERSAMPLE", 10)))
+    # Opened read-only when it indexes the same rows: code/embedding.py and update_embeddings sync every persisted
+    # index whenever the embeddings are written. Only a missing index, or one over other rows, is updated here.
+    path = Path(folder) / INDEX_FILES[kind]
+    if path.exists():
+        index = load_index(kind, folder)
+        if np.array_equal(np.sort(index.ids), np.sort(np.asarray(ids, dtype=np.int64))):
+            return index
+    return sync_index(kind, ids, matrix, folder)
+
+
+def locate(indexed_ids, ids):
+    """Return the row of each id in `indexed_ids` (-1 if absent) and a mask of the absent ones."""
+    if len(indexed_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64), np.ones(len(ids), dtype=bool)
+    order = np.argsort(indexed_ids)
+    slots = np.searchsorted(indexed_ids, ids, sorter=order).clip(max=len(order) - 1)
+    found = indexed_ids[order[slots]] == ids
+    rows = np.where(found, order[slots], -1)
+    return rows, ~found
+
+
+def train_centroids(matrix, nlist, iterations=10, seed=0):
+    """Spherical k-means on a sample of the normalized rows; returns `nlist` unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(matrix))
+    sample = matrix[rng.choice(len(matrix), min(len(matrix), nlist * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = ~sums.any(axis=1)
+        # Empty clusters are re-seeded with random sample rows.
+        sums[empty] = sample[rng.choice(len(sample), empty.sum())]
+        centroids = normalize(sums)
+    return centroids.astype(np.float32)
+
+
+def search_rows(matrix, rows, queries, k, threshold=None):
+    """Exact search restricted to `rows` of a normalized matrix; positions are rows of the full matrix."""
+    scores = queries @ matrix[rows].T
+    return [(rows[positions], best) for positions, best in (top_k(row, k, threshold) for row in scores)]
+
+
+def normalize(matrix):
+    """Scale each row to unit length; all-zero rows are left as zeros."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k, threshold=None):
+    """Return (positions, scores) of the k highest scores in descending order, optionally above a threshold."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < len(scores):
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    positions = positions[np.argsort(-scores[positions], kind="stable")]
+    best = scores[positions]
+    if threshold is not None:
+        keep = best > threshold
+        positions, best = positions[keep], best[keep]
+    return positions, best
@@ -18,7 +18,8 @@ CREATE TABLE cleaned_data (
     address TEXT, 
     description TEXT, 
     facilities_services TEXT, 
-    latitude_and_longitude TEXT, 
+    latitude DOUBLE PRECISION, 
+    longitude DOUBLE PRECISION, 
     food_type VARCHAR(100), 
     country VARCHAR(100), 
     stars_label VARCHAR(255), 
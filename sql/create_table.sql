@@ -1,6 +1,9 @@
 -- To install the pgvector extension
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- PostGIS, for the restaurant locations
+CREATE EXTENSION IF NOT EXISTS postgis;
+
 -- Create the ISO Country Codes Table
 CREATE TABLE iso_country_codes (
     iso_code CHAR(10) PRIMARY KEY, 
@@ -17,30 +20,15 @@ CREATE TABLE cleaned_data_with_embeddings (
     address TEXT, 
     description TEXT, 
     facilities_services TEXT, 
-    latitude_and_longitude TEXT, 
-    food_type VARCHAR(100), 
-    country VARCHAR(100), 
-    stars_label VARCHAR(255), 
-    price_symbol_count VARCHAR(255),
-    ISO_Code CHAR(10), 
-    embedding vector(384)
-    );
-
--- Create indexes in the cleaned_data table
-CREATE INDEX name_idx ON cleaned_data_with_embeddings (name);
-CREATE INDEX food_type_idx ON cleaned_data_with_embeddings (food_type);
-CREATE INDEX country_idx ON cleaned_data_with_embeddings (country);
-CREATE INDEX stars_label_idx ON cleaned_data_with_embeddings (stars_label);T NULL, 
-    address TEXT, 
-    description TEXT, 
-    facilities_services TEXT, 
-    latitude_and_longitude TEXT, 
+    latitude DOUBLE PRECISION, 
+    longitude DOUBLE PRECISION, 
     food_type VARCHAR(100), 
     country VARCHAR(100), 
-    stars_label VARCHAR(255), 
-    price_symbol_count VARCHAR(255),
+    stars_label INTEGER, 
+    price_symbol_count INTEGER,
     ISO_Code CHAR(10), 
-    embedding vector(384)
+    embedding vector(384),
+    location geography(Point, 4326) GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED
     );
 
 -- Create indexes in the cleaned_data table
@@ -48,6 +36,4 @@ CREATE INDEX name_idx ON cleaned_data_with_embeddings (name);
 CREATE INDEX food_type_idx ON cleaned_data_with_embeddings (food_type);
 CREATE INDEX country_idx ON cleaned_data_with_embeddings (country);
 CREATE INDEX stars_label_idx ON cleaned_data_with_embeddings (stars_label);
-
-
-
+CREATE INDEX location_gist_idx ON cleaned_data_with_embeddings USING GIST (location);
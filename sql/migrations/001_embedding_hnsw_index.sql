@@ -0,0 +1,23 @@
+-- Vector index for RestaurantMatcher.match (needs pgvector 0.5.0 or later).
+-- Every migration is idempotent: they are all applied again after the table is reloaded.
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- pandas.to_sql writes the embeddings as text; only a vector column can be indexed.
+DO $$
+BEGIN
+    IF (SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+        WHERE attrelid = 'cleaned_data_with_embeddings'::regclass AND attname = 'embedding') <> 'vector(384)' THEN
+        ALTER TABLE cleaned_data_with_embeddings
+            ALTER COLUMN embedding TYPE vector(384) USING embedding::text::vector(384);
+    END IF;
+END $$;
+
+-- HNSW graph over cosine distance, used by ORDER BY embedding <=> :user_embedding LIMIT :limit.
+-- The query-time breadth is the session setting hnsw.ef_search (HNSW_EF_SEARCH in match_sql.py).
+-- IVFFlat builds faster and smaller, at lower recall; tune it with ivfflat.probes (IVFFLAT_PROBES):
+--   CREATE INDEX embedding_ivfflat_idx ON cleaned_data_with_embeddings
+--       USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS embedding_hnsw_idx ON cleaned_data_with_embeddings
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+ANALYZE cleaned_data_with_embeddings;
@@ -0,0 +1,54 @@
+-- Typed, indexed filter columns for RestaurantMatcher.match(filters=...).
+DO $$
+DECLARE
+    target_column text;
+BEGIN
+    -- pandas.to_sql may write the star and price counts as text or floats; filters compare integers.
+    FOREACH target_column IN ARRAY ARRAY['stars_label', 'price_symbol_count'] LOOP
+        IF (SELECT c.data_type FROM information_schema.columns c
+            WHERE c.table_name = 'cleaned_data_with_embeddings' AND c.column_name = target_column) <> 'integer' THEN
+            EXECUTE format(
+                'ALTER TABLE cleaned_data_with_embeddings ALTER COLUMN %1$I TYPE integer '
+                'USING CASE WHEN %1$I::text ~ ''^\s*-?[0-9]+(\.0*)?\s*$'' THEN round(%1$I::text::numeric)::integer END',
+                target_column
+            );
+        END IF;
+    END LOOP;
+
+    -- Numeric coordinates for the radius filter, parsed from the "{'lat': .., 'lng': ..}" text.
+    -- ALTER TABLE locks out readers even when the columns exist, so it only runs when one is missing.
+    IF (SELECT count(*) FROM information_schema.columns c
+        WHERE c.table_name = 'cleaned_data_with_embeddings' AND c.column_name IN ('latitude', 'longitude')) < 2 THEN
+        ALTER TABLE cleaned_data_with_embeddings
+            ADD COLUMN IF NOT EXISTS latitude double precision,
+            ADD COLUMN IF NOT EXISTS longitude double precision;
+    END IF;
+    IF EXISTS (SELECT 1 FROM information_schema.columns c
+               WHERE c.table_name = 'cleaned_data_with_embeddings' AND c.column_name = 'latitude_and_longitude') THEN
+        UPDATE cleaned_data_with_embeddings
+        SET latitude = substring(latitude_and_longitude from '''lat'':\s*(-?[0-9.eE+-]+)')::double precision,
+            longitude = substring(latitude_and_longitude from '''lng'':\s*(-?[0-9.eE+-]+)')::double precision
+        WHERE latitude IS NULL AND latitude_and_longitude LIKE '%''lat''%';
+    END IF;
+END $$;
+
+-- The btree indexes of sql/create_table.sql, which are lost when the table is replaced, plus the new columns.
+CREATE INDEX IF NOT EXISTS food_type_idx ON cleaned_data_with_embeddings (food_type);
+CREATE INDEX IF NOT EXISTS country_idx ON cleaned_data_with_embeddings (country);
+CREATE INDEX IF NOT EXISTS stars_label_idx ON cleaned_data_with_embeddings (stars_label);
+CREATE INDEX IF NOT EXISTS iso_code_idx ON cleaned_data_with_embeddings (iso_code);
+CREATE INDEX IF NOT EXISTS price_symbol_count_idx ON cleaned_data_with_embeddings (price_symbol_count);
+CREATE INDEX IF NOT EXISTS latitude_longitude_idx ON cleaned_data_with_embeddings (latitude, longitude);
+
+-- Partial HNSW indexes, one per star level. A query filtered on a single stars_label walks a graph of only
+-- those restaurants, instead of dropping the other levels from the candidates of the full graph.
+CREATE INDEX IF NOT EXISTS embedding_hnsw_stars_0_idx ON cleaned_data_with_embeddings
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) WHERE stars_label = 0;
+CREATE INDEX IF NOT EXISTS embedding_hnsw_stars_1_idx ON cleaned_data_with_embeddings
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) WHERE stars_label = 1;
+CREATE INDEX IF NOT EXISTS embedding_hnsw_stars_2_idx ON cleaned_data_with_embeddings
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) WHERE stars_label = 2;
+CREATE INDEX IF NOT EXISTS embedding_hnsw_stars_3_idx ON cleaned_data_with_embeddings
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64) WHERE stars_label = 3;
+
+ANALYZE cleaned_data_with_embeddings;
@@ -0,0 +1,18 @@
+-- Restaurant locations as a PostGIS geography, kept in sync with latitude/longitude by a generated column.
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+-- ALTER TABLE locks out readers even when the column exists, so it only runs on the first application.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns c
+                   WHERE c.table_name = 'cleaned_data_with_embeddings' AND c.column_name = 'location') THEN
+        ALTER TABLE cleaned_data_with_embeddings
+            ADD COLUMN location geography(Point, 4326)
+            GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED;
+    END IF;
+END $$;
+
+-- Serves the ST_DWithin radius filter and ORDER BY location <-> point nearest-neighbour queries.
+CREATE INDEX IF NOT EXISTS location_gist_idx ON cleaned_data_with_embeddings USING GIST (location);
+
+ANALYZE cleaned_data_with_embeddings;
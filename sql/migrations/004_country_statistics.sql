@@ -0,0 +1,38 @@
+-- Restaurant counts per country and star level for the world map, computed at ingest instead of on every page load.
+-- Applying the migrations (after every reload of the table) refreshes the view and records when, so the
+-- app's cached copy (code/country_statistics.py) knows to reload.
+CREATE MATERIALIZED VIEW IF NOT EXISTS country_statistics AS
+SELECT
+    iso_code,
+    country,
+    COUNT(*) AS total_michelin,
+    COUNT(*) FILTER (WHERE stars_label = 0) AS zero_star,
+    COUNT(*) FILTER (WHERE stars_label = 1) AS one_star,
+    COUNT(*) FILTER (WHERE stars_label = 2) AS two_star,
+    COUNT(*) FILTER (WHERE stars_label = 3) AS three_star
+FROM cleaned_data_with_embeddings
+GROUP BY iso_code, country
+WITH NO DATA;
+
+-- One row per (iso_code, country) group; REFRESH ... CONCURRENTLY needs a unique index to match old rows to new.
+CREATE UNIQUE INDEX IF NOT EXISTS country_statistics_country_idx ON country_statistics (iso_code, country);
+
+-- The first refresh populates the view. Later ones run concurrently, so the app keeps reading the old counts
+-- instead of waiting on the exclusive lock of a plain refresh.
+DO $$
+BEGIN
+    IF (SELECT ispopulated FROM pg_matviews WHERE schemaname = current_schema() AND matviewname = 'country_statistics') THEN
+        REFRESH MATERIALIZED VIEW CONCURRENTLY country_statistics;
+    ELSE
+        REFRESH MATERIALIZED VIEW country_statistics;
+    END IF;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS view_refreshes (
+    view_name TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL
+);
+
+INSERT INTO view_refreshes (view_name, refreshed_at) VALUES ('country_statistics', clock_timestamp())
+ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
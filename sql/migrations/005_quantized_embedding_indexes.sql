@@ -0,0 +1,12 @@
+-- Compressed HNSW indexes for RestaurantMatcher(storage="halfvec" or "binary"), PG_VECTOR_STORAGE in match_sql.py.
+-- halfvec keeps 2 bytes per dimension and binary_quantize() one bit; the matcher reranks their candidates
+-- by the full-precision embedding column, which is left unchanged. Both need pgvector 0.7.0 or later.
+DO $$
+BEGIN
+    IF (SELECT string_to_array(extversion, '.')::int[] FROM pg_extension WHERE extname = 'vector') >= ARRAY[0, 7] THEN
+        CREATE INDEX IF NOT EXISTS embedding_halfvec_hnsw_idx ON cleaned_data_with_embeddings
+            USING hnsw ((embedding::halfvec(384)) halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+        CREATE INDEX IF NOT EXISTS embedding_binary_hnsw_idx ON cleaned_data_with_embeddings
+            USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops) WITH (m = 16, ef_construction = 64);
+    END IF;
+END $$;
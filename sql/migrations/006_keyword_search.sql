@@ -0,0 +1,20 @@
+-- Full-text search for the keyword side of RestaurantMatcher.hybrid_search (KEYWORD_QUERY in match_sql.py).
+-- The same fields as the BM25 index of code/keyword_index.py, kept in sync with the rows by a generated column,
+-- so the app needs no local artifact and the keyword matches follow every load of the table.
+-- ALTER TABLE locks out readers even when the column exists, so it only runs on the first application.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns c
+                   WHERE c.table_name = 'cleaned_data_with_embeddings' AND c.column_name = 'search_text') THEN
+        ALTER TABLE cleaned_data_with_embeddings
+            ADD COLUMN search_text tsvector
+            GENERATED ALWAYS AS (to_tsvector('english',
+                coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(food_type, '') || ' '
+                || coalesce(facilities_services, '')
+            )) STORED;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS search_text_gin_idx ON cleaned_data_with_embeddings USING GIN (search_text);
+
+ANALYZE cleaned_data_with_embeddings;